@@ -1,71 +1,124 @@
-import { query, mutation } from "./_generated/server";
-import { v } from "convex/values";
+import {
+  query,
+  mutation,
+  type MutationCtx,
+  type QueryCtx,
+} from "./_generated/server";
+import { v, type Infer } from "convex/values";
+import type { Id } from "./_generated/dataModel";
+
+const datasetFields = {
+  repo_id: v.string(),
+  name: v.string(),
+  task: v.string(),
+  source_type: v.string(),
+  environment: v.string(),
+  num_episodes: v.optional(v.int64()),
+  model_id: v.optional(v.string()),
+  model_url: v.optional(v.string()),
+  notes: v.optional(v.string()),
+};
+
+const datasetValidator = v.object(datasetFields);
+
+async function upsertDataset(
+  ctx: MutationCtx,
+  args: Infer<typeof datasetValidator>
+) {
+  const existing = await ctx.db
+    .query("datasets")
+    .withIndex("by_repo", (q) => q.eq("repo_id", args.repo_id))
+    .unique();
+  if (existing) {
+    await ctx.db.patch(existing._id, { ...args });
+    return existing._id;
+  }
+  return await ctx.db.insert("datasets", args);
+}
 
 export const register = mutation({
-  args: {
-    repo_id: v.string(),
-    name: v.string(),
-    task: v.string(),
-    source_type: v.string(),
-    environment: v.string(),
-    num_episodes: v.optional(v.int64()),
-    model_id: v.optional(v.string()),
-    model_url: v.optional(v.string()),
-    notes: v.optional(v.string()),
+  args: datasetFields,
+  handler: async (ctx, args) => {
+    return await upsertDataset(ctx, args);
   },
+});
+
+// Register many datasets in one transaction; returns their IDs in order.
+export const registerBulk = mutation({
+  args: { datasets: v.array(datasetValidator) },
   handler: async (ctx, args) => {
-    const existing = await ctx.db
-      .query("datasets")
-      .withIndex("by_repo", (q) => q.eq("repo_id", args.repo_id))
-      .unique();
-    if (existing) {
-      await ctx.db.patch(existing._id, { ...args });
-      return existing._id;
+    const ids: Id<"datasets">[] = [];
+    for (const dataset of args.datasets) {
+      ids.push(await upsertDataset(ctx, dataset));
     }
-    return await ctx.db.insert("datasets", args);
+    return ids;
   },
 });
 
+const statsFields = {
+  repo_id: v.string(),
+  num_episodes: v.number(),
+  total_duration_seconds: v.number(),
+  num_success: v.optional(v.number()),
+  num_failure: v.optional(v.number()),
+  num_human_frames: v.optional(v.number()),
+  num_policy_frames: v.optional(v.number()),
+  num_autonomous_success: v.optional(v.number()),
+  stats_key: v.optional(v.string()),
+};
+
+const statsValidator = v.object(statsFields);
+
+async function applyStats(
+  ctx: MutationCtx,
+  args: Infer<typeof statsValidator>
+) {
+  const dataset = await ctx.db
+    .query("datasets")
+    .withIndex("by_repo", (q) => q.eq("repo_id", args.repo_id))
+    .unique();
+  if (!dataset) return;
+  const patch: Record<string, unknown> = {};
+
+  const count = BigInt(args.num_episodes);
+  if (dataset.num_episodes !== count) patch.num_episodes = count;
+  if (dataset.total_duration_seconds !== args.total_duration_seconds)
+    patch.total_duration_seconds = args.total_duration_seconds;
+
+  for (const field of [
+    "num_success",
+    "num_failure",
+    "num_human_frames",
+    "num_policy_frames",
+    "num_autonomous_success",
+  ] as const) {
+    const val = args[field];
+    if (val != null) {
+      const bigVal = BigInt(val);
+      if (dataset[field] !== bigVal) patch[field] = bigVal;
+    }
+  }
+  if (args.stats_key !== undefined && dataset.stats_key !== args.stats_key)
+    patch.stats_key = args.stats_key;
+
+  if (Object.keys(patch).length > 0) {
+    await ctx.db.patch(dataset._id, patch);
+  }
+}
+
 export const updateStats = mutation({
-  args: {
-    repo_id: v.string(),
-    num_episodes: v.number(),
-    total_duration_seconds: v.number(),
-    num_success: v.optional(v.number()),
-    num_failure: v.optional(v.number()),
-    num_human_frames: v.optional(v.number()),
-    num_policy_frames: v.optional(v.number()),
-    num_autonomous_success: v.optional(v.number()),
-  },
+  args: statsFields,
   handler: async (ctx, args) => {
-    const dataset = await ctx.db
-      .query("datasets")
-      .withIndex("by_repo", (q) => q.eq("repo_id", args.repo_id))
-      .unique();
-    if (!dataset) return;
-    const patch: Record<string, unknown> = {};
-
-    const count = BigInt(args.num_episodes);
-    if (dataset.num_episodes !== count) patch.num_episodes = count;
-    if (dataset.total_duration_seconds !== args.total_duration_seconds)
-      patch.total_duration_seconds = args.total_duration_seconds;
-
-    for (const field of [
-      "num_success",
-      "num_failure",
-      "num_human_frames",
-      "num_policy_frames",
-      "num_autonomous_success",
-    ] as const) {
-      const val = args[field];
-      if (val != null) {
-        const bigVal = BigInt(val);
-        if (dataset[field] !== bigVal) patch[field] = bigVal;
-      }
-    }
+    await applyStats(ctx, args);
+  },
+});
 
-    if (Object.keys(patch).length > 0) {
-      await ctx.db.patch(dataset._id, patch);
+// Apply many datasets' stats updates in one transaction.
+export const updateStatsBulk = mutation({
+  args: { updates: v.array(statsValidator) },
+  handler: async (ctx, args) => {
+    for (const update of args.updates) {
+      await applyStats(ctx, update);
     }
   },
 });
@@ -115,26 +168,83 @@ export const updateTask = mutation({
   },
 });
 
+async function listDatasets(
+  ctx: QueryCtx,
+  sourceType: string | undefined,
+  task: string | undefined,
+  sourceTypes: string[] | undefined
+) {
+  // A single-element source_types filter can use the index directly.
+  if (!sourceType && sourceTypes?.length === 1) {
+    sourceType = sourceTypes[0];
+    sourceTypes = undefined;
+  }
+  let datasets;
+  if (sourceType) {
+    datasets = await ctx.db
+      .query("datasets")
+      .withIndex("by_source_type", (q) => q.eq("source_type", sourceType))
+      .collect();
+  } else {
+    datasets = await ctx.db.query("datasets").collect();
+  }
+  if (sourceTypes && sourceTypes.length > 0) {
+    const allowed = new Set(sourceTypes);
+    datasets = datasets.filter((d) => allowed.has(d.source_type));
+  }
+  if (task) {
+    datasets = datasets.filter((d) => d.task === task);
+  }
+  return datasets.sort((a, b) => b._creationTime - a._creationTime);
+}
+
+// FNV-1a over the serialized rows: a cheap version tag that changes whenever
+// any listed dataset is added, removed, or patched.
+function fingerprint(rows: unknown[]): string {
+  const text = JSON.stringify(rows, (_key, val) =>
+    typeof val === "bigint" ? val.toString() : val
+  );
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < text.length; i++) {
+    hash ^= text.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return `${rows.length}-${(hash >>> 0).toString(16)}`;
+}
+
 export const list = query({
   args: {
     source_type: v.optional(v.string()),
+    source_types: v.optional(v.array(v.string())),
     task: v.optional(v.string()),
   },
   handler: async (ctx, args) => {
-    let datasets;
-    if (args.source_type) {
-      datasets = await ctx.db
-        .query("datasets")
-        .withIndex("by_source_type", (q) =>
-          q.eq("source_type", args.source_type!)
-        )
-        .collect();
-    } else {
-      datasets = await ctx.db.query("datasets").collect();
-    }
-    if (args.task) {
-      datasets = datasets.filter((d) => d.task === args.task);
-    }
-    return datasets.sort((a, b) => b._creationTime - a._creationTime);
+    return await listDatasets(
+      ctx,
+      args.source_type,
+      args.task,
+      args.source_types
+    );
+  },
+});
+
+// Same filters as `list`, for clients holding a cached copy: returns the
+// current etag, and the rows only when it differs from `args.etag`.
+export const listIfChanged = query({
+  args: {
+    source_type: v.optional(v.string()),
+    source_types: v.optional(v.array(v.string())),
+    task: v.optional(v.string()),
+    etag: v.optional(v.string()),
+  },
+  handler: async (ctx, args) => {
+    const datasets = await listDatasets(
+      ctx,
+      args.source_type,
+      args.task,
+      args.source_types
+    );
+    const etag = fingerprint(datasets);
+    return { etag, datasets: etag === args.etag ? null : datasets };
   },
 });
@@ -1,65 +1,101 @@
-import { query } from "./_generated/server";
+import { query, type QueryCtx } from "./_generated/server";
 import { v } from "convex/values";
 
-export const getPairCounts = query({
-  args: {
-    environment: v.optional(v.string()),
-  },
-  handler: async (ctx, args) => {
-    // Get policies (optionally filtered by environment)
-    let policies;
-    if (args.environment) {
-      policies = await ctx.db
-        .query("policies")
-        .withIndex("by_environment", (q) => q.eq("environment", args.environment!))
-        .collect();
-    } else {
-      policies = await ctx.db.query("policies").collect();
-    }
+async function computePairCounts(
+  ctx: QueryCtx,
+  environment: string | undefined
+): Promise<Record<string, Record<string, number>>> {
+  // Get policies (optionally filtered by environment)
+  let policies;
+  if (environment) {
+    policies = await ctx.db
+      .query("policies")
+      .withIndex("by_environment", (q) => q.eq("environment", environment))
+      .collect();
+  } else {
+    policies = await ctx.db.query("policies").collect();
+  }
 
-    // Build policy_id -> model_id map
-    const idToModelId = new Map<string, string>();
-    const policyIds = new Set<string>();
-    for (const p of policies) {
-      idToModelId.set(p._id as string, p.model_id);
-      policyIds.add(p._id as string);
-    }
+  // Build policy_id -> model_id map
+  const idToModelId = new Map<string, string>();
+  const policyIds = new Set<string>();
+  for (const p of policies) {
+    idToModelId.set(p._id as string, p.model_id);
+    policyIds.add(p._id as string);
+  }
 
-    // Collect all round results for these policies, grouped by (session_id, round_index)
-    const roundGroups = new Map<string, string[]>(); // "session_id|round_index" -> [model_id, ...]
-    for (const p of policies) {
-      const results = await ctx.db
-        .query("roundResults")
-        .withIndex("by_policy", (q) => q.eq("policy_id", p._id))
-        .collect();
-      for (const r of results) {
-        const key = `${r.session_id}|${r.round_index}`;
-        const modelId = idToModelId.get(r.policy_id as string);
-        if (!modelId) continue;
-        if (!roundGroups.has(key)) {
-          roundGroups.set(key, []);
-        }
-        roundGroups.get(key)!.push(modelId);
+  // Collect all round results for these policies, grouped by (session_id, round_index)
+  const roundGroups = new Map<string, string[]>(); // "session_id|round_index" -> [model_id, ...]
+  for (const p of policies) {
+    const results = await ctx.db
+      .query("roundResults")
+      .withIndex("by_policy", (q) => q.eq("policy_id", p._id))
+      .collect();
+    for (const r of results) {
+      const key = `${r.session_id}|${r.round_index}`;
+      const modelId = idToModelId.get(r.policy_id as string);
+      if (!modelId) continue;
+      if (!roundGroups.has(key)) {
+        roundGroups.set(key, []);
       }
+      roundGroups.get(key)!.push(modelId);
     }
+  }
 
-    // Count pairwise co-occurrences
-    const counts: Record<string, Record<string, number>> = {};
-    for (const modelIds of roundGroups.values()) {
-      // All pairs within this round group
-      for (let i = 0; i < modelIds.length; i++) {
-        for (let j = i + 1; j < modelIds.length; j++) {
-          const a = modelIds[i];
-          const b = modelIds[j];
-          if (!counts[a]) counts[a] = {};
-          if (!counts[b]) counts[b] = {};
-          counts[a][b] = (counts[a][b] || 0) + 1;
-          counts[b][a] = (counts[b][a] || 0) + 1;
-        }
+  // Count pairwise co-occurrences
+  const counts: Record<string, Record<string, number>> = {};
+  for (const modelIds of roundGroups.values()) {
+    // All pairs within this round group
+    for (let i = 0; i < modelIds.length; i++) {
+      for (let j = i + 1; j < modelIds.length; j++) {
+        const a = modelIds[i];
+        const b = modelIds[j];
+        if (!counts[a]) counts[a] = {};
+        if (!counts[b]) counts[b] = {};
+        counts[a][b] = (counts[a][b] || 0) + 1;
+        counts[b][a] = (counts[b][a] || 0) + 1;
       }
     }
+  }
+
+  return counts;
+}
+
+async function listCandidates(
+  ctx: QueryCtx,
+  environment: string | undefined,
+  excludeModelIds: string[] | undefined
+) {
+  let policies = await ctx.db.query("policies").collect();
 
-    return counts;
+  // Filter by environment if specified
+  if (environment) {
+    policies = policies.filter((p) => p.environment === environment);
+  }
+
+  // Exclude specific model_ids (e.g. the focus policy in calibrate mode)
+  if (excludeModelIds) {
+    const excluded = new Set(excludeModelIds);
+    policies = policies.filter((p) => !excluded.has(p.model_id));
+  }
+
+  // Return all candidates sorted by ELO (descending).
+  // Random sampling is done client-side to avoid deterministic
+  // Math.random() in Convex queries.
+  const sorted = [...policies].sort((a, b) => b.elo - a.elo);
+  return sorted.map((p) => ({
+    model_id: p.model_id,
+    name: p.name,
+    elo: p.elo,
+  }));
+}
+
+export const getPairCounts = query({
+  args: {
+    environment: v.optional(v.string()),
+  },
+  handler: async (ctx, args) => {
+    return await computePairCounts(ctx, args.environment);
   },
 });
 
@@ -69,28 +105,64 @@ export const getOpponents = query({
     exclude_model_ids: v.optional(v.array(v.string())),
   },
   handler: async (ctx, args) => {
-    let policies = await ctx.db.query("policies").collect();
+    return await listCandidates(ctx, args.environment, args.exclude_model_ids);
+  },
+});
 
-    // Filter by environment if specified
-    if (args.environment) {
-      policies = policies.filter((p) => p.environment === args.environment);
-    }
+// Candidates and pair counts in one round trip, for diversity-weighted
+// sampling on the client.
+export const getBundle = query({
+  args: {
+    environment: v.optional(v.string()),
+    exclude_model_ids: v.optional(v.array(v.string())),
+  },
+  handler: async (ctx, args) => {
+    const [candidates, pair_counts] = await Promise.all([
+      listCandidates(ctx, args.environment, args.exclude_model_ids),
+      computePairCounts(ctx, args.environment),
+    ]);
+    return { candidates, pair_counts };
+  },
+});
 
-    // Exclude specific model_ids (e.g. the focus policy in calibrate mode)
-    if (args.exclude_model_ids) {
-      policies = policies.filter(
-        (p) => !args.exclude_model_ids!.includes(p.model_id)
-      );
-    }
+// mulberry32: small seeded PRNG. Queries must be deterministic, so the
+// randomness comes from a client-supplied seed instead of Math.random().
+function seededRandom(seed: number): () => number {
+  let a = seed >>> 0;
+  return () => {
+    a = (a + 0x6d2b79f5) >>> 0;
+    let t = a;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+// Uniform random opponents: a seeded partial Fisher-Yates shuffle picks
+// num_opponents distinct candidates, so only the picked rows are sent to
+// the client.
+export const getRandomOpponents = query({
+  args: {
+    num_opponents: v.number(),
+    seed: v.number(),
+    environment: v.optional(v.string()),
+    exclude_model_ids: v.optional(v.array(v.string())),
+  },
+  handler: async (ctx, args) => {
+    const candidates = await listCandidates(
+      ctx,
+      args.environment,
+      args.exclude_model_ids
+    );
+    const k = args.num_opponents;
+    const n = candidates.length;
+    if (n <= k) return candidates;
 
-    // Return all candidates sorted by ELO (descending).
-    // Random sampling is done client-side to avoid deterministic
-    // Math.random() in Convex queries.
-    const sorted = [...policies].sort((a, b) => b.elo - a.elo);
-    return sorted.map((p) => ({
-      model_id: p.model_id,
-      name: p.name,
-      elo: p.elo,
-    }));
+    const random = seededRandom(args.seed);
+    for (let i = 0; i < k; i++) {
+      const j = i + Math.floor(random() * (n - i));
+      [candidates[i], candidates[j]] = [candidates[j], candidates[i]];
+    }
+    return candidates.slice(0, k);
   },
 });
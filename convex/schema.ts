@@ -54,6 +54,7 @@ export default defineSchema({
     num_human_frames: v.optional(v.int64()),
     num_policy_frames: v.optional(v.int64()),
     num_autonomous_success: v.optional(v.int64()),
+    stats_key: v.optional(v.string()),       // HF revision the stats were computed from
     model_id: v.optional(v.string()),        // programmatic policy lookup key (URI-prefixed)
     model_url: v.optional(v.string()),       // human-facing link (W&B artifact/run, HF Hub, etc.)
     notes: v.optional(v.string()),
@@ -1,7 +1,9 @@
+from policy_arena.async_client import AsyncPolicyArenaClient
 from policy_arena.client import PolicyArenaClient
 from policy_arena.types import PolicyInput, RoundResultInput, RoundInput
 
 __all__ = [
+    "AsyncPolicyArenaClient",
     "PolicyArenaClient",
     "PolicyInput",
     "RoundResultInput",
@@ -0,0 +1,303 @@
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+import numpy as np
+
+from policy_arena.client import (
+    _Plan,
+    _add_rounds_args,
+    _chunked_session_plan,
+    _opponent_args,
+    _recommendation_plan,
+    _rollout_rounds,
+    _session_args,
+    _stats_args,
+    _streaming_rollout_plan,
+)
+from policy_arena.sampling import DiverseSampler
+from policy_arena.transport import AsyncConvexTransport
+from policy_arena.types import DatasetInput, PolicyInput, RoundInput, serialize_rounds
+
+
+async def _run_plan_async(plan: _Plan, call: Callable[[str, dict], Awaitable]) -> Any:
+    """Like :func:`policy_arena.client._run_plan`, awaiting each request."""
+    result = None
+    try:
+        while True:
+            result = await call(*plan.send(result))
+    except StopIteration as stop:
+        return stop.value
+
+
+class AsyncPolicyArenaClient:
+    """``asyncio`` counterpart of :class:`PolicyArenaClient`.
+
+    Methods are coroutines with the same arguments and results, so
+    independent queries can run concurrently::
+
+        async with AsyncPolicyArenaClient(url) as client:
+            leaderboard, pair_counts = await asyncio.gather(
+                client.get_leaderboard(), client.get_pair_counts(env)
+            )
+
+    At most *max_concurrency* requests are in flight at once. The in-memory
+    query cache behaves as in :class:`PolicyArenaClient`; there is no disk
+    cache.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        cache_ttl: float = 60.0,
+        max_concurrency: int = 32,
+        seed: int | None = None,
+        compress_requests: bool = False,
+    ):
+        self.client = AsyncConvexTransport(
+            url,
+            max_concurrency=max_concurrency,
+            compress_requests=compress_requests,
+        )
+        self.cache_ttl = cache_ttl
+        self._rng = np.random.default_rng(seed)
+        self._cache: dict[tuple, tuple[float, Any]] = {}
+
+    async def close(self) -> None:
+        """Release the pooled HTTP connections."""
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncPolicyArenaClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def invalidate_cache(self) -> None:
+        """Drop all cached query results."""
+        self._cache.clear()
+
+    async def _cached_query(self, name: str, args: dict) -> Any:
+        frozen_args = tuple(sorted(
+            (k, tuple(v) if isinstance(v, list) else v) for k, v in args.items()
+        ))
+        key = (name, frozen_args)
+        now = time.monotonic()
+        hit = self._cache.get(key)
+        if hit is not None and now - hit[0] < self.cache_ttl:
+            return hit[1]
+        result = await self.client.query(name, args)
+        self._cache[key] = (now, result)
+        return result
+
+    async def _mutation(self, name: str, args: dict) -> Any:
+        try:
+            return await self.client.mutation(name, args)
+        finally:
+            self.invalidate_cache()
+
+    async def submit_eval_session(
+        self,
+        dataset_repo: str,
+        policies: list[PolicyInput],
+        rounds: list[RoundInput],
+        notes: str | None = None,
+        session_mode: str | None = None,
+    ) -> str:
+        """Submit evaluation results. Policies are auto-registered."""
+        args = _session_args(
+            dataset_repo, policies, serialize_rounds(rounds), notes, session_mode
+        )
+        return await self._mutation("evalSessions:submit", args)
+
+    async def submit_eval_session_chunked(
+        self,
+        dataset_repo: str,
+        policies: list[PolicyInput],
+        rounds: list[RoundInput],
+        notes: str | None = None,
+        session_mode: str | None = None,
+        chunk_size: int = 500,
+    ) -> str:
+        """See :meth:`PolicyArenaClient.submit_eval_session_chunked`.
+
+        Chunks are awaited one after another; ELO updates depend on order.
+        """
+        plan = _chunked_session_plan(
+            dataset_repo, policies, rounds, notes, session_mode, chunk_size
+        )
+        return await _run_plan_async(plan, self._mutation)
+
+    async def submit_rollout_session(
+        self,
+        dataset_repo: str,
+        policy: PolicyInput,
+        episodes: list[tuple[int, bool, int | None]],
+        notes: str | None = None,
+    ) -> str:
+        """Submit a rollout session (single policy, no ELO changes)."""
+        args = _session_args(
+            dataset_repo,
+            [policy],
+            _rollout_rounds(policy.model_id, episodes),
+            notes,
+            "rollout",
+        )
+        return await self._mutation("evalSessions:submit", args)
+
+    async def submit_rollout_session_streaming(
+        self,
+        dataset_repo: str,
+        policy: PolicyInput,
+        episode_batches: Iterable[list[tuple[int, bool, int | None]]],
+        notes: str | None = None,
+    ) -> str | None:
+        """See :meth:`PolicyArenaClient.submit_rollout_session_streaming`."""
+        plan = _streaming_rollout_plan(dataset_repo, policy, episode_batches, notes)
+        return await _run_plan_async(plan, self._mutation)
+
+    async def get_pair_counts(
+        self, environment: str | None = None
+    ) -> dict[str, dict[str, int]]:
+        """Get pairwise co-occurrence counts across all arena sessions."""
+        args: dict = {}
+        if environment is not None:
+            args["environment"] = environment
+        return await self.client.query("recommendations:getPairCounts", args)
+
+    async def get_recommendation_bundle(
+        self,
+        environment: str | None = None,
+        exclude_model_ids: list[str] | None = None,
+    ) -> dict:
+        """Fetch opponent candidates and pair counts in a single query."""
+        return await self.client.query(
+            "recommendations:getBundle",
+            _opponent_args(environment, exclude_model_ids),
+        )
+
+    async def get_recommended_opponents(
+        self,
+        num_opponents: int = 2,
+        environment: str | None = None,
+        exclude_model_ids: list[str] | None = None,
+        pair_counts: dict[str, dict[str, int]] | None = None,
+        seed_model_ids: list[str] | None = None,
+        bundle: dict | None = None,
+        strict_diversity: bool = True,
+        sampler: DiverseSampler | None = None,
+    ) -> list[dict]:
+        """See :meth:`PolicyArenaClient.get_recommended_opponents`."""
+        plan = _recommendation_plan(
+            self._rng, num_opponents, environment, exclude_model_ids,
+            pair_counts, seed_model_ids, bundle, strict_diversity, sampler,
+        )
+        return await _run_plan_async(plan, self.client.query)
+
+    async def add_rounds(
+        self,
+        session_id: str,
+        policies: list[PolicyInput],
+        rounds: list[RoundInput],
+    ) -> str:
+        """Append rounds to an existing eval session and update ELO."""
+        return await self._mutation(
+            "evalSessions:addRounds",
+            _add_rounds_args(session_id, policies, serialize_rounds(rounds)),
+        )
+
+    async def get_rollout_session(self, dataset_repo: str) -> dict | None:
+        """Look up an existing rollout session by dataset repo ID."""
+        return await self.client.query(
+            "evalSessions:getByDatasetRepo",
+            {"dataset_repo": dataset_repo, "session_mode": "rollout"},
+        )
+
+    async def delete_session(self, session_id: str) -> dict:
+        """Delete an eval session and recompute ELO for all policies."""
+        return await self._mutation("evalSessions:deleteSession", {"id": session_id})
+
+    async def register_dataset(self, dataset: DatasetInput) -> str:
+        """Register a dataset in the arena for browsing."""
+        return await self._mutation("datasets:register", dataset.to_dict())
+
+    async def register_datasets_bulk(self, datasets: list[DatasetInput]) -> list[str]:
+        """Register many datasets in one mutation. Returns their IDs in order."""
+        return await self._mutation(
+            "datasets:registerBulk", {"datasets": [d.to_dict() for d in datasets]}
+        )
+
+    async def list_datasets(
+        self,
+        task: str | None = None,
+        source_types: list[str] | None = None,
+    ) -> list[dict]:
+        """List registered datasets, optionally filtered by task and source types."""
+        args: dict = {}
+        if task is not None:
+            args["task"] = task
+        if source_types:
+            args["source_types"] = list(source_types)
+        return await self._cached_query("datasets:list", args)
+
+    async def update_dataset_stats(
+        self,
+        repo_id: str,
+        num_episodes: int,
+        total_duration_seconds: float,
+        num_success: int | None = None,
+        num_failure: int | None = None,
+        num_human_frames: int | None = None,
+        num_policy_frames: int | None = None,
+        num_autonomous_success: int | None = None,
+        stats_key: str | None = None,
+    ) -> None:
+        """Update a dataset's episode and frame statistics.
+
+        Optional counts left as None keep their stored value. *stats_key*
+        records what the stats were computed from (e.g. an HF revision) so
+        backfills can skip datasets that haven't changed.
+        """
+        await self._mutation(
+            "datasets:updateStats",
+            _stats_args(
+                repo_id,
+                num_episodes,
+                total_duration_seconds,
+                num_success,
+                num_failure,
+                num_human_frames,
+                num_policy_frames,
+                num_autonomous_success,
+                stats_key,
+            ),
+        )
+
+    async def update_dataset_stats_bulk(self, updates: list[dict]) -> None:
+        """Apply many :meth:`update_dataset_stats` calls in one mutation.
+
+        Each entry holds that method's keyword arguments.
+        """
+        await self._mutation(
+            "datasets:updateStatsBulk",
+            {"updates": [_stats_args(**update) for update in updates]},
+        )
+
+    async def update_dataset_task(
+        self, repo_id: str, task: str, environment: str
+    ) -> str:
+        """Re-categorize a dataset to a different task/environment."""
+        return await self._mutation(
+            "datasets:updateTask",
+            {"repo_id": repo_id, "task": task, "environment": environment},
+        )
+
+    async def update_policy_environment(self, model_id: str, environment: str) -> str:
+        """Re-categorize a policy to a different environment."""
+        return await self._mutation(
+            "policies:updateEnvironment",
+            {"model_id": model_id, "environment": environment},
+        )
+
+    async def get_leaderboard(self) -> list[dict]:
+        """Get current leaderboard."""
+        return await self._cached_query("policies:leaderboard", {})
@@ -0,0 +1,54 @@
+"""On-disk cache for query results that should survive across processes."""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from convex.values import convex_to_json, json_to_convex
+
+
+def default_cache_dir() -> Path:
+    """``$XDG_CACHE_HOME/policy_arena``, defaulting to ``~/.cache/policy_arena``."""
+    return Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "policy_arena"
+
+
+class DiskCache:
+    """A JSON file of ``key -> {etag, stored_at, value}`` entries.
+
+    Values are stored in Convex's JSON encoding so Int64 fields round-trip.
+    Writes go through a temp file and ``os.replace`` so readers never see a
+    partial file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> dict | None:
+        """Return the entry for *key* with its value decoded, or None."""
+        entry = self._load().get(key)
+        if entry is None:
+            return None
+        return {**entry, "value": json_to_convex(entry["value"])}
+
+    def put(self, key: str, etag: str, value: Any) -> None:
+        entries = self._load()
+        entries[key] = {
+            "etag": etag,
+            "stored_at": time.time(),
+            "value": convex_to_json(value),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entries))
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
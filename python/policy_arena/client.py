@@ -1,13 +1,331 @@
-import random
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Callable, Generator, Iterable
 
-from convex import ConvexClient
+import numpy as np
 
-from policy_arena.types import DatasetInput, PolicyInput, RoundInput, RoundResultInput
+from policy_arena.cache import DiskCache, default_cache_dir
+from policy_arena.sampling import DiverseSampler, uniform_sample
+from policy_arena.transport import ConvexTransport
+from policy_arena.types import (
+    DatasetInput,
+    PolicyInput,
+    RoundInput,
+    _i64,
+    serialize_rounds,
+)
+
+
+def _session_args(
+    dataset_repo: str,
+    policies: list[PolicyInput],
+    rounds: list[dict],
+    notes: str | None,
+    session_mode: str | None,
+) -> dict:
+    """Arguments for ``evalSessions:submit`` from an already-serialized *rounds*."""
+    args = {
+        "dataset_repo": dataset_repo,
+        "policies": [p.to_dict() for p in policies],
+        "rounds": rounds,
+    }
+    if notes is not None:
+        args["notes"] = notes
+    if session_mode is not None:
+        args["session_mode"] = session_mode
+    return args
+
+
+def _rollout_rounds(
+    model_id: str, episodes: list[tuple[int, bool, int | None]], start: int = 0
+) -> list[dict]:
+    """One single-result round per ``(episode_index, success, num_frames)``.
+
+    Round indices count up from *start*. Builds the payload directly; a
+    RoundInput + RoundResultInput per episode would only be created to be
+    serialized straight away.
+    """
+    rounds = []
+    for i, (episode_index, success, num_frames) in enumerate(episodes, start):
+        result = {
+            "model_id": model_id,
+            "success": success,
+            "episode_index": _i64(episode_index),
+        }
+        if num_frames is not None:
+            result["num_frames"] = _i64(num_frames)
+        rounds.append({"round_index": _i64(i), "results": [result]})
+    return rounds
+
+
+def _stats_args(
+    repo_id: str,
+    num_episodes: int,
+    total_duration_seconds: float,
+    num_success: int | None = None,
+    num_failure: int | None = None,
+    num_human_frames: int | None = None,
+    num_policy_frames: int | None = None,
+    num_autonomous_success: int | None = None,
+    stats_key: str | None = None,
+) -> dict:
+    """``datasets:updateStats`` arguments, leaving out counts that are None."""
+    args = {
+        "repo_id": repo_id,
+        "num_episodes": num_episodes,
+        "total_duration_seconds": total_duration_seconds,
+    }
+    for field, value in (
+        ("num_success", num_success),
+        ("num_failure", num_failure),
+        ("num_human_frames", num_human_frames),
+        ("num_policy_frames", num_policy_frames),
+        ("num_autonomous_success", num_autonomous_success),
+        ("stats_key", stats_key),
+    ):
+        if value is not None:
+            args[field] = value
+    return args
+
+
+# Plans describe a multi-request operation without doing any I/O: each step
+# yields a ``(function_name, args)`` request and is sent back its result, and
+# the plan's return value is the operation's result. The sync and async
+# clients drive the same plans, with _run_plan here and _run_plan_async in
+# async_client.
+_Plan = Generator[tuple[str, dict], Any, Any]
+
+
+def _run_plan(plan: _Plan, call: Callable[[str, dict], Any]) -> Any:
+    """Drive *plan*, sending each requested ``call(name, args)`` back in."""
+    result = None
+    try:
+        while True:
+            result = call(*plan.send(result))
+    except StopIteration as stop:
+        return stop.value
+
+
+def _add_rounds_args(
+    session_id: str, policies: list[PolicyInput], rounds: list[dict]
+) -> dict:
+    """Arguments for ``evalSessions:addRounds`` from an already-serialized *rounds*."""
+    return {
+        "id": session_id,
+        "policies": [p.to_dict() for p in policies],
+        "rounds": rounds,
+    }
+
+
+def _chunked_session_plan(
+    dataset_repo: str,
+    policies: list[PolicyInput],
+    rounds: list[RoundInput],
+    notes: str | None,
+    session_mode: str | None,
+    chunk_size: int,
+) -> _Plan:
+    """Mutations for ``submit_eval_session_chunked``; returns the session ID."""
+    # Checked before the first mutation, so a bad size never leaves an
+    # empty session behind.
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    session_id = yield "evalSessions:submit", _session_args(
+        dataset_repo, policies, serialize_rounds(rounds[:chunk_size]), notes, session_mode
+    )
+    for start in range(chunk_size, len(rounds), chunk_size):
+        yield "evalSessions:addRounds", _add_rounds_args(
+            session_id, policies, serialize_rounds(rounds[start:start + chunk_size])
+        )
+    # addRounds rewrites the notes with a round summary; restore ours.
+    if notes is not None and len(rounds) > chunk_size:
+        yield "evalSessions:updateNotes", {"id": session_id, "notes": notes}
+    return session_id
+
+
+def _streaming_rollout_plan(
+    dataset_repo: str,
+    policy: PolicyInput,
+    episode_batches: Iterable[list[tuple[int, bool, int | None]]],
+    notes: str | None,
+) -> _Plan:
+    """Mutations for ``submit_rollout_session_streaming``; returns the
+    session ID, or None if there were no episodes."""
+    session_id = None
+    num_rounds = 0
+    appended = False
+    for episodes in episode_batches:
+        if not episodes:
+            continue
+        rounds = _rollout_rounds(policy.model_id, episodes, num_rounds)
+        if session_id is None:
+            session_id = yield "evalSessions:submit", _session_args(
+                dataset_repo, [policy], rounds, notes, "rollout"
+            )
+        else:
+            yield "evalSessions:addRounds", _add_rounds_args(session_id, [policy], rounds)
+            appended = True
+        num_rounds += len(episodes)
+    # addRounds rewrites the notes with a round summary; restore ours.
+    if notes is not None and appended:
+        yield "evalSessions:updateNotes", {"id": session_id, "notes": notes}
+    return session_id
+
+
+def _opponent_args(
+    environment: str | None, exclude_model_ids: list[str] | None
+) -> dict:
+    args: dict = {}
+    if environment is not None:
+        args["environment"] = environment
+    if exclude_model_ids is not None:
+        args["exclude_model_ids"] = exclude_model_ids
+    return args
+
+
+def _recommendation_plan(
+    rng: np.random.Generator,
+    num_opponents: int,
+    environment: str | None,
+    exclude_model_ids: list[str] | None,
+    pair_counts: dict[str, dict[str, int]] | None,
+    seed_model_ids: list[str] | None,
+    bundle: dict | None,
+    strict_diversity: bool,
+    sampler: DiverseSampler | None,
+) -> _Plan:
+    """Queries for ``get_recommended_opponents``; returns the opponents.
+
+    A *sampler* or *bundle* samples locally without querying. Otherwise,
+    without pair counts the backend picks uniformly from a seed drawn from
+    *rng*, and with them all candidates are fetched and sampled here.
+    """
+    if sampler is not None:
+        return sampler.sample(
+            num_opponents, seed_model_ids, rng,
+            strict_diversity=strict_diversity,
+            exclude_model_ids=exclude_model_ids,
+        )
+
+    if bundle is not None:
+        candidates = bundle["candidates"]
+        if pair_counts is None:
+            pair_counts = bundle.get("pair_counts")
+    elif pair_counts is None:
+        args = _opponent_args(environment, exclude_model_ids)
+        args["num_opponents"] = num_opponents
+        args["seed"] = int(rng.integers(2**32))
+        return (yield "recommendations:getRandomOpponents", args)
+    else:
+        candidates = yield "recommendations:getOpponents", _opponent_args(
+            environment, exclude_model_ids
+        )
+
+    if len(candidates) <= num_opponents:
+        return candidates
+
+    if pair_counts is not None:
+        return DiverseSampler(candidates, pair_counts).sample(
+            num_opponents, seed_model_ids, rng, strict_diversity
+        )
+
+    return uniform_sample(candidates, num_opponents, rng)
 
 
 class PolicyArenaClient:
-    def __init__(self, url: str):
-        self.client = ConvexClient(url)
+    def __init__(
+        self,
+        url: str,
+        cache_ttl: float = 60.0,
+        disk_cache: bool = False,
+        disk_cache_ttl: float = 300.0,
+        seed: int | None = None,
+        compress_requests: bool = False,
+    ):
+        """Connect to a Policy Arena deployment.
+
+        Args:
+            url: Convex deployment URL.
+            cache_ttl: Seconds to reuse ``list_datasets``/``get_leaderboard``
+                results within this process. Any mutation made through this
+                client clears the cache. Use 0 to disable caching.
+            disk_cache: Also keep ``list_datasets`` results on disk (see
+                :func:`policy_arena.cache.default_cache_dir`) so they survive
+                across processes. Each deployment URL has its own file.
+            disk_cache_ttl: Seconds a disk entry is used without contacting
+                the server. Older entries are revalidated by etag, and the
+                rows are only downloaded again if the server's copy changed.
+            seed: Seed for opponent sampling, for reproducible recommendations.
+            compress_requests: Gzip large request bodies, such as big
+                ``submit_eval_session`` payloads. Only enable this if the
+                deployment accepts ``Content-Encoding: gzip``.
+        """
+        self.client = ConvexTransport(url, compress_requests=compress_requests)
+        self.cache_ttl = cache_ttl
+        self._rng = np.random.default_rng(seed)
+        self._cache: dict[tuple, tuple[float, Any]] = {}
+        self.disk_cache_ttl = disk_cache_ttl
+        # One file per deployment, so clients for different URLs never
+        # read each other's datasets.
+        deployment = hashlib.sha1(self.client.url.encode()).hexdigest()[:16]
+        self._disk_cache = (
+            DiskCache(default_cache_dir() / f"datasets-{deployment}.json")
+            if disk_cache
+            else None
+        )
+
+    def close(self) -> None:
+        """Release the pooled HTTP connections."""
+        self.client.close()
+
+    def __enter__(self) -> "PolicyArenaClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def set_debug(self, enabled: bool = True) -> None:
+        """Toggle DEBUG logging of opponent-sampling weights.
+
+        Applies to the ``policy_arena`` logger, so it affects every client in
+        the process. Adds a stderr handler if none is configured.
+        """
+        logger = logging.getLogger("policy_arena")
+        logger.setLevel(logging.DEBUG if enabled else logging.NOTSET)
+        if enabled and not logger.hasHandlers():
+            logger.addHandler(logging.StreamHandler())
+
+    def invalidate_cache(self) -> None:
+        """Drop all cached query results, including the on-disk cache."""
+        self._cache.clear()
+        if self._disk_cache is not None:
+            self._disk_cache.clear()
+
+    def _cached_query(
+        self,
+        name: str,
+        args: dict,
+        fetch: Callable[[str, dict], Any] | None = None,
+    ) -> Any:
+        frozen_args = tuple(sorted(
+            (k, tuple(v) if isinstance(v, list) else v) for k, v in args.items()
+        ))
+        key = (name, frozen_args)
+        now = time.monotonic()
+        hit = self._cache.get(key)
+        if hit is not None and now - hit[0] < self.cache_ttl:
+            return hit[1]
+        result = (fetch or self.client.query)(name, args)
+        self._cache[key] = (now, result)
+        return result
+
+    def _mutation(self, name: str, args: dict) -> Any:
+        try:
+            return self.client.mutation(name, args)
+        finally:
+            self.invalidate_cache()
 
     def submit_eval_session(
         self,
@@ -18,16 +336,31 @@ class PolicyArenaClient:
         session_mode: str | None = None,
     ) -> str:
         """Submit evaluation results. Policies are auto-registered."""
-        args = {
-            "dataset_repo": dataset_repo,
-            "policies": [p.to_dict() for p in policies],
-            "rounds": [r.to_dict() for r in rounds],
-        }
-        if notes is not None:
-            args["notes"] = notes
-        if session_mode is not None:
-            args["session_mode"] = session_mode
-        return self.client.mutation("evalSessions:submit", args)
+        args = _session_args(
+            dataset_repo, policies, serialize_rounds(rounds), notes, session_mode
+        )
+        return self._mutation("evalSessions:submit", args)
+
+    def submit_eval_session_chunked(
+        self,
+        dataset_repo: str,
+        policies: list[PolicyInput],
+        rounds: list[RoundInput],
+        notes: str | None = None,
+        session_mode: str | None = None,
+        chunk_size: int = 500,
+    ) -> str:
+        """Submit a large eval session in bounded-size mutations.
+
+        The first *chunk_size* rounds create the session and the rest are
+        appended with :meth:`add_rounds`, in order, so ELO updates match a
+        single submission. Returns the session ID. Raises ValueError,
+        before anything is sent, if *chunk_size* is not positive.
+        """
+        plan = _chunked_session_plan(
+            dataset_repo, policies, rounds, notes, session_mode, chunk_size
+        )
+        return _run_plan(plan, self._mutation)
 
     def submit_rollout_session(
         self,
@@ -44,27 +377,31 @@ class PolicyArenaClient:
             episodes: List of (episode_index, success, num_frames) tuples.
             notes: Optional session notes.
         """
-        rounds = [
-            RoundInput(
-                round_index=i,
-                results=[
-                    RoundResultInput(
-                        model_id=policy.model_id,
-                        success=success,
-                        episode_index=episode_index,
-                        num_frames=num_frames,
-                    )
-                ],
-            )
-            for i, (episode_index, success, num_frames) in enumerate(episodes)
-        ]
-        return self.submit_eval_session(
-            dataset_repo=dataset_repo,
-            policies=[policy],
-            rounds=rounds,
-            notes=notes,
-            session_mode="rollout",
+        args = _session_args(
+            dataset_repo,
+            [policy],
+            _rollout_rounds(policy.model_id, episodes),
+            notes,
+            "rollout",
         )
+        return self._mutation("evalSessions:submit", args)
+
+    def submit_rollout_session_streaming(
+        self,
+        dataset_repo: str,
+        policy: PolicyInput,
+        episode_batches: Iterable[list[tuple[int, bool, int | None]]],
+        notes: str | None = None,
+    ) -> str | None:
+        """Submit a rollout session batch by batch as *episode_batches* yields.
+
+        The first non-empty batch creates the session and each later batch
+        is appended with ``evalSessions:addRounds``, so only one batch is
+        held at a time. Round indices continue across batches. Returns the
+        session ID, or None if there were no episodes.
+        """
+        plan = _streaming_rollout_plan(dataset_repo, policy, episode_batches, notes)
+        return _run_plan(plan, self._mutation)
 
     def get_pair_counts(self, environment: str | None = None) -> dict[str, dict[str, int]]:
         """Get pairwise co-occurrence counts across all arena sessions.
@@ -77,50 +414,34 @@ class PolicyArenaClient:
             args["environment"] = environment
         return self.client.query("recommendations:getPairCounts", args)
 
+    def get_recommendation_bundle(
+        self,
+        environment: str | None = None,
+        exclude_model_ids: list[str] | None = None,
+    ) -> dict:
+        """Fetch opponent candidates and pair counts in a single query.
+
+        Returns ``{"candidates": [...], "pair_counts": {...}}``. Pass the result
+        as *bundle* to :meth:`get_recommended_opponents` to skip its own
+        queries.
+        """
+        return self.client.query(
+            "recommendations:getBundle",
+            _opponent_args(environment, exclude_model_ids),
+        )
+
     @staticmethod
-    def _diverse_sample(
-        candidates: list[dict],
-        k: int,
-        pair_counts: dict[str, dict[str, int]],
-        seed_model_ids: list[str] | None = None,
-    ) -> list[dict]:
-        """Iterative weighted sampling: prefer under-tested pairings.
+    def prepare_diverse_sampler(
+        candidates: list[dict], pair_counts: dict[str, dict[str, int]]
+    ) -> DiverseSampler:
+        """Pack *pair_counts* for *candidates* into a reusable sampler.
 
-        Each pick is weighted by ``1 / (1 + sum_of_pair_counts_with_selected)``.
-        *seed_model_ids* are pre-seeded as "already selected" (e.g. focus
-        policies in calibrate mode) but are NOT added to the result.
+        Use this when sampling opponents for many focus policies against the
+        same candidate list: pass the sampler to
+        :meth:`get_recommended_opponents`, or call its
+        :meth:`~policy_arena.sampling.DiverseSampler.sample` directly.
         """
-        selected_model_ids: list[str] = list(seed_model_ids) if seed_model_ids else []
-        selected: list[dict] = []
-        remaining = list(candidates)
-
-        for pick_num in range(k):
-            if not remaining:
-                break
-
-            # Compute weights
-            weights: list[float] = []
-            for c in remaining:
-                mid = c["model_id"]
-                total = sum(
-                    pair_counts.get(mid, {}).get(sel, 0)
-                    for sel in selected_model_ids
-                )
-                weights.append(1.0 / (1.0 + total))
-
-            # Debug: show weights for first pick (or all if small pool)
-            if pick_num == 0 or len(remaining) <= 6:
-                print(f"  [diverse_sample] pick {pick_num + 1}/{k}, "
-                      f"pool={len(remaining)} candidates:")
-                for c, w in zip(remaining, weights):
-                    print(f"    {c['model_id'].split('/')[-1]}: weight={w:.3f}")
-
-            chosen = random.choices(remaining, weights=weights, k=1)[0]
-            selected.append(chosen)
-            selected_model_ids.append(chosen["model_id"])
-            remaining.remove(chosen)
-
-        return selected
+        return DiverseSampler(candidates, pair_counts)
 
     def get_recommended_opponents(
         self,
@@ -129,12 +450,17 @@ class PolicyArenaClient:
         exclude_model_ids: list[str] | None = None,
         pair_counts: dict[str, dict[str, int]] | None = None,
         seed_model_ids: list[str] | None = None,
+        bundle: dict | None = None,
+        strict_diversity: bool = True,
+        sampler: DiverseSampler | None = None,
     ) -> list[dict]:
         """Get model IDs of recommended opponents via diversity-weighted sampling.
 
-        Fetches all candidates from the backend (sorted by ELO descending)
-        and samples client-side to avoid deterministic Math.random() in
-        Convex queries.
+        With pair counts, fetches all candidates from the backend (sorted by
+        ELO descending) and samples client-side to avoid deterministic
+        Math.random() in Convex queries. Without them, picks uniformly at
+        random on the backend from a client-drawn seed, so only the picked
+        rows are transferred.
 
         Args:
             num_opponents: Number of opponents to recommend.
@@ -144,26 +470,20 @@ class PolicyArenaClient:
                 diversity-aware weighted sampling instead of uniform random.
             seed_model_ids: Model IDs pre-seeded as "already selected" for
                 weighting (e.g. focus policies in calibrate mode).
+            bundle: Result of :meth:`get_recommendation_bundle`. Its candidates
+                are used instead of querying, and its pair counts are used
+                unless *pair_counts* is also given.
+            strict_diversity: If False, draw all diversity-weighted picks in
+                one pass against the seeds only (see :meth:`DiverseSampler.sample`).
+            sampler: Result of :meth:`prepare_diverse_sampler`. Samples from
+                its candidates and pair counts, minus *exclude_model_ids*,
+                without querying.
         """
-        query_args: dict = {}
-        if environment is not None:
-            query_args["environment"] = environment
-        if exclude_model_ids is not None:
-            query_args["exclude_model_ids"] = exclude_model_ids
-        candidates = self.client.query(
-            "recommendations:getOpponents",
-            query_args,
+        plan = _recommendation_plan(
+            self._rng, num_opponents, environment, exclude_model_ids,
+            pair_counts, seed_model_ids, bundle, strict_diversity, sampler,
         )
-
-        if len(candidates) <= num_opponents:
-            return candidates
-
-        if pair_counts is not None:
-            return self._diverse_sample(
-                candidates, num_opponents, pair_counts, seed_model_ids,
-            )
-
-        return random.sample(candidates, num_opponents)
+        return _run_plan(plan, self.client.query)
 
     def add_rounds(
         self,
@@ -172,13 +492,9 @@ class PolicyArenaClient:
         rounds: list[RoundInput],
     ) -> str:
         """Append rounds to an existing eval session and update ELO."""
-        return self.client.mutation(
+        return self._mutation(
             "evalSessions:addRounds",
-            {
-                "id": session_id,
-                "policies": [p.to_dict() for p in policies],
-                "rounds": [r.to_dict() for r in rounds],
-            },
+            _add_rounds_args(session_id, policies, serialize_rounds(rounds)),
         )
 
     def get_rollout_session(self, dataset_repo: str) -> dict | None:
@@ -190,13 +506,19 @@ class PolicyArenaClient:
 
     def delete_session(self, session_id: str) -> dict:
         """Delete an eval session and recompute ELO for all policies."""
-        return self.client.mutation(
+        return self._mutation(
             "evalSessions:deleteSession", {"id": session_id}
         )
 
     def register_dataset(self, dataset: DatasetInput) -> str:
         """Register a dataset in the arena for browsing."""
-        return self.client.mutation("datasets:register", dataset.to_dict())
+        return self._mutation("datasets:register", dataset.to_dict())
+
+    def register_datasets_bulk(self, datasets: list[DatasetInput]) -> list[str]:
+        """Register many datasets in one mutation. Returns their IDs in order."""
+        return self._mutation(
+            "datasets:registerBulk", {"datasets": [d.to_dict() for d in datasets]}
+        )
 
     def list_datasets(
         self,
@@ -207,27 +529,87 @@ class PolicyArenaClient:
         args: dict = {}
         if task is not None:
             args["task"] = task
-        datasets = self.client.query("datasets:list", args)
         if source_types:
-            datasets = [d for d in datasets if d["source_type"] in source_types]
+            args["source_types"] = list(source_types)
+        fetch = self._query_datasets_via_disk if self._disk_cache is not None else None
+        return self._cached_query("datasets:list", args, fetch)
+
+    def _query_datasets_via_disk(self, name: str, args: dict) -> list[dict]:
+        """``datasets:list`` backed by the disk cache, revalidated by etag."""
+        key = json.dumps(args, sort_keys=True)
+        entry = self._disk_cache.get(key)
+        if entry is not None and time.time() - entry["stored_at"] < self.disk_cache_ttl:
+            return entry["value"]
+
+        query_args = dict(args)
+        if entry is not None:
+            query_args["etag"] = entry["etag"]
+        resp = self.client.query("datasets:listIfChanged", query_args)
+        datasets = resp["datasets"]
+        if datasets is None:  # unchanged since cached
+            datasets = entry["value"]
+        self._disk_cache.put(key, resp["etag"], datasets)
         return datasets
 
+    def update_dataset_stats(
+        self,
+        repo_id: str,
+        num_episodes: int,
+        total_duration_seconds: float,
+        num_success: int | None = None,
+        num_failure: int | None = None,
+        num_human_frames: int | None = None,
+        num_policy_frames: int | None = None,
+        num_autonomous_success: int | None = None,
+        stats_key: str | None = None,
+    ) -> None:
+        """Update a dataset's episode and frame statistics.
+
+        Optional counts left as None keep their stored value. *stats_key*
+        records what the stats were computed from (e.g. an HF revision) so
+        backfills can skip datasets that haven't changed.
+        """
+        self._mutation(
+            "datasets:updateStats",
+            _stats_args(
+                repo_id,
+                num_episodes,
+                total_duration_seconds,
+                num_success,
+                num_failure,
+                num_human_frames,
+                num_policy_frames,
+                num_autonomous_success,
+                stats_key,
+            ),
+        )
+
+    def update_dataset_stats_bulk(self, updates: list[dict]) -> None:
+        """Apply many :meth:`update_dataset_stats` calls in one mutation.
+
+        Each entry holds that method's keyword arguments.
+        """
+        self._mutation(
+            "datasets:updateStatsBulk",
+            {"updates": [_stats_args(**update) for update in updates]},
+        )
+
     def update_dataset_task(
         self, repo_id: str, task: str, environment: str
     ) -> str:
         """Re-categorize a dataset to a different task/environment."""
-        return self.client.mutation(
+        return self._mutation(
             "datasets:updateTask",
             {"repo_id": repo_id, "task": task, "environment": environment},
         )
 
     def update_policy_environment(self, model_id: str, environment: str) -> str:
         """Re-categorize a policy to a different environment."""
-        return self.client.mutation(
+        return self._mutation(
             "policies:updateEnvironment",
             {"model_id": model_id, "environment": environment},
         )
 
     def get_leaderboard(self) -> list[dict]:
         """Get current leaderboard."""
-        return self.client.query("policies:leaderboard")
+        return self._cached_query("policies:leaderboard", {})
@@ -25,7 +25,7 @@ def main():
     )
     args = parser.parse_args()
 
-    client = PolicyArenaClient(CONVEX_URL)
+    client = PolicyArenaClient(CONVEX_URL, disk_cache=True)
     datasets = client.list_datasets(task=args.task, source_types=args.source)
 
     for d in datasets:
@@ -0,0 +1,148 @@
+"""Diversity-weighted opponent sampling."""
+
+import logging
+from functools import cached_property
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DiverseSampler:
+    """Pair counts for a fixed candidate list, packed into a NumPy matrix.
+
+    Build one per candidate list and call :meth:`sample` for each focus
+    policy; the matrix and id map are only built once.
+
+    ``counts`` has one row per candidate. Its first ``n`` columns are the
+    candidates themselves, in the same order, and the remaining columns are
+    any other model IDs (e.g. excluded focus policies) that appear in the
+    pair counts, so seeds need not be candidates.
+    """
+
+    def __init__(self, candidates: list[dict], pair_counts: dict[str, dict[str, int]]):
+        self.candidates = candidates
+        self.model_ids = [c["model_id"] for c in candidates]
+        n = len(candidates)
+
+        column_of = {mid: i for i, mid in enumerate(self.model_ids)}
+        entries = []
+        for i, mid in enumerate(self.model_ids):
+            for other, count in pair_counts.get(mid, {}).items():
+                j = column_of.setdefault(other, len(column_of))
+                entries.append((i, j, count))
+        self.column_of = column_of
+
+        self.counts = np.zeros((n, len(column_of)), dtype=np.int64)
+        if entries:
+            rows, cols, values = zip(*entries)
+            self.counts[rows, cols] = values
+
+    @cached_property
+    def short_names(self) -> list[str]:
+        """Model IDs without their ``entity/project/`` prefix, for debug logs."""
+        return [mid.rsplit("/", 1)[-1] for mid in self.model_ids]
+
+    def seed_totals(self, seed_model_ids: list[str] | None) -> np.ndarray:
+        """Each candidate's summed pair count against *seed_model_ids*."""
+        indicator = np.zeros(self.counts.shape[1], dtype=np.int64)
+        for mid in seed_model_ids or []:
+            j = self.column_of.get(mid)
+            if j is not None:
+                indicator[j] += 1
+        return self.counts @ indicator
+
+    def sample(
+        self,
+        k: int,
+        seed_model_ids: list[str] | None = None,
+        rng: np.random.Generator | None = None,
+        strict_diversity: bool = True,
+        exclude_model_ids: list[str] | None = None,
+    ) -> list[dict]:
+        """Iterative weighted sampling: prefer under-tested pairings.
+
+        Each pick is weighted by ``1 / (1 + sum_of_pair_counts_with_selected)``.
+        *seed_model_ids* are pre-seeded as "already selected" (e.g. focus
+        policies in calibrate mode) but are NOT added to the result.
+        Candidates in *exclude_model_ids* are never picked.
+
+        With ``strict_diversity=False`` the weights only count pairings with
+        the seeds, and all *k* picks are drawn in one pass with
+        Efraimidis-Spirakis sampling (keep the *k* largest ``u ** (1 / w)``).
+        Picks then no longer steer away from each other.
+        """
+        rng = rng or np.random.default_rng()
+        n = len(self.candidates)
+
+        # Candidates still in play live in pool[:size].
+        pool = np.arange(n)
+        if exclude_model_ids:
+            excluded = set(exclude_model_ids)
+            pool = pool[[mid not in excluded for mid in self.model_ids]]
+        size = len(pool)
+
+        # Running pair-count total of each candidate against everything
+        # selected so far, starting from the seeds.
+        totals = self.seed_totals(seed_model_ids)
+
+        if not strict_diversity:
+            weights = 1.0 / (1.0 + totals[pool])
+            if logger.isEnabledFor(logging.DEBUG):
+                short_names = self.short_names
+                logger.debug("diverse_sample: one-pass %d picks, pool=%d", k, size)
+                for i, w in zip(pool, weights):
+                    logger.debug("  %s: weight=%.3f", short_names[i], w)
+            # log(u) / w orders candidates the same as u ** (1 / w) without
+            # underflowing for small weights.
+            keys = np.log(rng.random(size)) / weights
+            if k >= size:
+                top = np.argsort(-keys)
+            else:
+                top = np.argpartition(-keys, k - 1)[:k]
+                top = top[np.argsort(-keys[top])]
+            return [self.candidates[i] for i in pool[top]]
+
+        counts = self.counts[:, :n]
+        selected: list[dict] = []
+
+        for pick_num in range(min(k, size)):
+            live = pool[:size]
+            weights = 1.0 / (1.0 + totals[live])
+
+            # Debug: show weights for first pick (or all if small pool)
+            if logger.isEnabledFor(logging.DEBUG) and (pick_num == 0 or size <= 6):
+                short_names = self.short_names
+                logger.debug("diverse_sample: pick %d/%d, pool=%d", pick_num + 1, k, size)
+                for i, w in zip(live, weights):
+                    logger.debug("  %s: weight=%.3f", short_names[i], w)
+
+            # Inverse-CDF draw on the cumulative weights: the same pick as
+            # rng.choice(size, p=weights / weights.sum()), minus its
+            # normalization and validation passes.
+            cum_weights = np.cumsum(weights)
+            u = rng.random() * cum_weights[-1]
+            pos = min(int(cum_weights.searchsorted(u, side="right")), size - 1)
+
+            # A pick is swapped to the end and the live region shrinks by one.
+            chosen = pool[pos]
+            size -= 1
+            pool[pos], pool[size] = pool[size], chosen
+            selected.append(self.candidates[chosen])
+            totals += counts[:, chosen]
+
+        return selected
+
+
+def uniform_sample(
+    candidates: list[dict], k: int, rng: np.random.Generator | None = None
+) -> list[dict]:
+    """*k* distinct candidates picked uniformly at random.
+
+    Local counterpart of ``recommendations:getRandomOpponents``.
+    """
+    rng = rng or np.random.default_rng()
+    if len(candidates) <= k:
+        return list(candidates)
+    picks = rng.choice(len(candidates), k, replace=False)
+    return [candidates[i] for i in picks]
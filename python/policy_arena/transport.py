@@ -0,0 +1,183 @@
+"""Pooled HTTP transports for the Convex query/mutation API."""
+
+import asyncio
+import gzip
+import json
+from typing import Any
+
+import httpx
+from convex import ConvexError, ConvexExecutionError, __version__ as convex_version
+from convex.values import convex_to_json, json_to_convex
+
+try:
+    import orjson
+except ImportError:  # optional: pip install policy-arena[fast]
+    orjson = None
+
+if orjson is not None:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    _loads = json.loads
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_GZIP_JSON_HEADERS = {**_JSON_HEADERS, "Content-Encoding": "gzip"}
+
+# Bodies at least this large are gzipped when compression is enabled.
+# Smaller ones don't repay the CPU.
+GZIP_MIN_BYTES = 4096
+
+
+def _limits(
+    max_connections: int, max_keepalive_connections: int, keepalive_expiry: float
+) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+def _payload(name: str, args: dict | None) -> bytes:
+    # convex_to_json already turns ConvexInt64 into its {"$integer": ...}
+    # wire form, so the encoder only ever sees plain JSON types.
+    return _dumps({
+        "path": name,
+        "format": "convex_encoded_json",
+        "args": convex_to_json(args or {}),
+    })
+
+
+def _body(payload: bytes, compress: bool) -> tuple[bytes, dict]:
+    """Request content and headers, gzipped if *compress* and worthwhile."""
+    if compress and len(payload) >= GZIP_MIN_BYTES:
+        return gzip.compress(payload, compresslevel=1), _GZIP_JSON_HEADERS
+    return payload, _JSON_HEADERS
+
+
+def _decode(resp: httpx.Response) -> Any:
+    """Return the decoded value of a Convex response or raise its error."""
+    try:
+        body = _loads(resp.content)
+    except ValueError:
+        body = None
+    if not body:
+        resp.raise_for_status()
+        raise ConvexExecutionError(f"Unexpected response format: {resp.text}")
+    # Function failures arrive as a 560 with an error body in the success
+    # format; only other HTTP errors carry code/message.
+    if resp.is_error and body.get("status") != "error":
+        raise ConvexExecutionError(
+            f"{resp.status_code} {body.get('code')}: {body.get('message')}"
+        )
+
+    if body["status"] == "success":
+        return json_to_convex(body["value"])
+    if "errorData" in body:
+        raise ConvexError(
+            body.get("errorMessage", "Convex error"),
+            json_to_convex(body["errorData"]),
+        )
+    raise ConvexExecutionError(body["errorMessage"])
+
+
+class ConvexTransport:
+    """Convex HTTP client backed by one keep-alive ``httpx.Client``.
+
+    Every query and mutation reuses the same connection pool, so TCP and TLS
+    setup are paid once per process instead of once per call.
+
+    With *compress_requests*, request bodies of at least
+    :data:`GZIP_MIN_BYTES` are sent gzipped (``Content-Encoding: gzip``).
+    It is off by default; only enable it against a deployment that accepts
+    compressed request bodies. Responses are always negotiated compressed
+    through httpx's default ``Accept-Encoding``.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 8,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 30.0,
+        compress_requests: bool = False,
+    ):
+        self.url = url.rstrip("/")
+        self.compress_requests = compress_requests
+        self._session = httpx.Client(
+            base_url=self.url,
+            http2=True,
+            limits=_limits(max_connections, max_keepalive_connections, keepalive_expiry),
+            timeout=timeout,
+            headers={"Convex-Client": f"python-{convex_version}"},
+        )
+
+    def _request(self, kind: str, name: str, args: dict | None) -> Any:
+        content, headers = _body(_payload(name, args), self.compress_requests)
+        resp = self._session.post(f"/api/{kind}", content=content, headers=headers)
+        return _decode(resp)
+
+    def query(self, name: str, args: dict | None = None) -> Any:
+        """Run a query and return its decoded result."""
+        return self._request("query", name, args)
+
+    def mutation(self, name: str, args: dict | None = None) -> Any:
+        """Run a mutation and return its decoded result."""
+        return self._request("mutation", name, args)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
+
+
+class AsyncConvexTransport:
+    """:class:`ConvexTransport` on ``httpx.AsyncClient``.
+
+    At most *max_concurrency* requests are in flight at once; further calls
+    wait on a semaphore instead of piling up on the connection pool.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 8,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 30.0,
+        max_concurrency: int = 32,
+        compress_requests: bool = False,
+    ):
+        self.url = url.rstrip("/")
+        self.compress_requests = compress_requests
+        self._session = httpx.AsyncClient(
+            base_url=self.url,
+            http2=True,
+            limits=_limits(max_connections, max_keepalive_connections, keepalive_expiry),
+            timeout=timeout,
+            headers={"Convex-Client": f"python-{convex_version}"},
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _request(self, kind: str, name: str, args: dict | None) -> Any:
+        content, headers = _body(_payload(name, args), self.compress_requests)
+        async with self._semaphore:
+            resp = await self._session.post(
+                f"/api/{kind}", content=content, headers=headers
+            )
+        return _decode(resp)
+
+    async def query(self, name: str, args: dict | None = None) -> Any:
+        """Run a query and return its decoded result."""
+        return await self._request("query", name, args)
+
+    async def mutation(self, name: str, args: dict | None = None) -> Any:
+        """Run a mutation and return its decoded result."""
+        return await self._request("mutation", name, args)
+
+    async def aclose(self) -> None:
+        """Close all pooled connections."""
+        await self._session.aclose()
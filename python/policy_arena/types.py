@@ -2,8 +2,17 @@ from dataclasses import dataclass
 
 from convex import ConvexInt64
 
+# Round/episode indices and frame counts are almost always small, so share one
+# wrapper per value instead of constructing a ConvexInt64 for every field.
+# Payloads are built and sent immediately; the shared wrappers are never mutated.
+_SMALL_INT64 = tuple(ConvexInt64(i) for i in range(4096))
 
-@dataclass
+
+def _i64(n: int) -> ConvexInt64:
+    return _SMALL_INT64[n] if 0 <= n < 4096 else ConvexInt64(n)
+
+
+@dataclass(slots=True, frozen=True)
 class PolicyInput:
     name: str
     model_id: str
@@ -24,7 +33,7 @@ class PolicyInput:
         return d
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RoundResultInput:
     model_id: str
     success: bool
@@ -35,26 +44,26 @@ class RoundResultInput:
         d = {
             "model_id": self.model_id,
             "success": self.success,
-            "episode_index": ConvexInt64(self.episode_index),
+            "episode_index": _i64(self.episode_index),
         }
         if self.num_frames is not None:
-            d["num_frames"] = ConvexInt64(self.num_frames)
+            d["num_frames"] = _i64(self.num_frames)
         return d
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RoundInput:
     round_index: int
     results: list[RoundResultInput]
 
     def to_dict(self) -> dict:
         return {
-            "round_index": ConvexInt64(self.round_index),
+            "round_index": _i64(self.round_index),
             "results": [r.to_dict() for r in self.results],
         }
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DatasetInput:
     repo_id: str
     name: str
@@ -75,7 +84,7 @@ class DatasetInput:
             "environment": self.environment,
         }
         if self.num_episodes is not None:
-            d["num_episodes"] = ConvexInt64(self.num_episodes)
+            d["num_episodes"] = _i64(self.num_episodes)
         if self.model_id is not None:
             d["model_id"] = self.model_id
         if self.model_url is not None:
@@ -83,3 +92,25 @@ class DatasetInput:
         if self.notes is not None:
             d["notes"] = self.notes
         return d
+
+
+def serialize_rounds(rounds: list[RoundInput]) -> list[dict]:
+    """Build the ``rounds`` mutation payload in a single pass.
+
+    Equivalent to ``[r.to_dict() for r in rounds]`` without the per-object
+    method dispatch.
+    """
+    payload: list[dict] = []
+    for rnd in rounds:
+        results = []
+        for res in rnd.results:
+            d = {
+                "model_id": res.model_id,
+                "success": res.success,
+                "episode_index": _i64(res.episode_index),
+            }
+            if res.num_frames is not None:
+                d["num_frames"] = _i64(res.num_frames)
+            results.append(d)
+        payload.append({"round_index": _i64(rnd.round_index), "results": results})
+    return payload
@@ -12,14 +12,24 @@ Session 3: ankile/blind-eval-dagger-progression-2026-02-14-r1
   - 3 policies, 12 complete rounds (round 13 incomplete, excluded).
 """
 
+import functools
+import hashlib
+import io
+import json
 import os
+from typing import NamedTuple
 
-import datasets
+import pyarrow.parquet as pq
+import requests
 from policy_arena import PolicyArenaClient, PolicyInput, RoundInput, RoundResultInput
+from policy_arena.cache import default_cache_dir
 
 
 CONVEX_URL = os.environ.get("CONVEX_URL", "https://grandiose-rook-292.convex.cloud")
 ENVIRONMENT = "franka_pick_cube"
+NUM_FRAMES_CACHE_DIR = default_cache_dir() / "num_frames"
+
+http = requests.Session()
 
 # Per-session artifact mappings: policy_id -> (model_id, name)
 SESSION1_POLICY_MAP = {
@@ -50,138 +60,180 @@ SESSION3_POLICY_MAP = {
     ),
 }
 
+
+class Episode(NamedTuple):
+    episode_index: int
+    success: int
+    policy_id: int
+    round_id: int
+
+
 # Raw episode data from HF (frame_index=0 rows).
-# Each tuple: (episode_index, success, policy_id, round_id)
 # round_id is 1-indexed as in the dataset.
 
 SESSION1_EPISODES = [
-    (0, 1, 1, 1),
-    (1, 1, 0, 1),
-    (2, 0, 1, 2),
-    (3, 1, 0, 1),
-    (4, 1, 1, 1),
-    (5, 1, 0, 2),
-    (6, 1, 1, 2),
-    (7, 0, 1, 3),
-    (8, 1, 0, 3),
-    (9, 0, 0, 4),
-    (10, 1, 1, 4),
-    (11, 1, 0, 5),
-    (12, 0, 1, 5),
-    (13, 1, 0, 6),
-    (14, 1, 1, 6),
-    (15, 0, 1, 7),
-    (16, 1, 0, 7),
-    (17, 0, 0, 8),
-    (18, 0, 1, 8),
-    (19, 1, 0, 9),
-    (20, 0, 1, 9),
-    (21, 1, 1, 10),
-    (22, 1, 0, 10),
+    Episode(0, 1, 1, 1),
+    Episode(1, 1, 0, 1),
+    Episode(2, 0, 1, 2),
+    Episode(3, 1, 0, 1),
+    Episode(4, 1, 1, 1),
+    Episode(5, 1, 0, 2),
+    Episode(6, 1, 1, 2),
+    Episode(7, 0, 1, 3),
+    Episode(8, 1, 0, 3),
+    Episode(9, 0, 0, 4),
+    Episode(10, 1, 1, 4),
+    Episode(11, 1, 0, 5),
+    Episode(12, 0, 1, 5),
+    Episode(13, 1, 0, 6),
+    Episode(14, 1, 1, 6),
+    Episode(15, 0, 1, 7),
+    Episode(16, 1, 0, 7),
+    Episode(17, 0, 0, 8),
+    Episode(18, 0, 1, 8),
+    Episode(19, 1, 0, 9),
+    Episode(20, 0, 1, 9),
+    Episode(21, 1, 1, 10),
+    Episode(22, 1, 0, 10),
 ]
 
 SESSION2_EPISODES = [
-    (0, 1, 1, 1),
-    (1, 1, 0, 1),
-    (2, 1, 1, 2),
-    (3, 0, 0, 2),
-    (4, 1, 1, 3),
-    (5, 0, 0, 3),
-    (6, 1, 0, 4),
-    (7, 1, 1, 4),
-    (8, 0, 0, 5),
-    (9, 0, 1, 5),
-    (10, 1, 0, 6),
-    (11, 0, 1, 6),
-    (12, 0, 1, 7),
-    (13, 0, 0, 7),
-    (14, 1, 0, 8),
-    (15, 1, 1, 8),
-    (16, 0, 1, 9),
-    (17, 0, 0, 9),
-    (18, 0, 0, 10),
-    (19, 1, 1, 10),
+    Episode(0, 1, 1, 1),
+    Episode(1, 1, 0, 1),
+    Episode(2, 1, 1, 2),
+    Episode(3, 0, 0, 2),
+    Episode(4, 1, 1, 3),
+    Episode(5, 0, 0, 3),
+    Episode(6, 1, 0, 4),
+    Episode(7, 1, 1, 4),
+    Episode(8, 0, 0, 5),
+    Episode(9, 0, 1, 5),
+    Episode(10, 1, 0, 6),
+    Episode(11, 0, 1, 6),
+    Episode(12, 0, 1, 7),
+    Episode(13, 0, 0, 7),
+    Episode(14, 1, 0, 8),
+    Episode(15, 1, 1, 8),
+    Episode(16, 0, 1, 9),
+    Episode(17, 0, 0, 9),
+    Episode(18, 0, 0, 10),
+    Episode(19, 1, 1, 10),
 ]
 
 SESSION3_EPISODES = [
-    (0, 1, 2, 1),
-    (1, 0, 0, 1),
-    (2, 1, 1, 1),
-    (3, 0, 0, 2),
-    (4, 1, 1, 2),
-    (5, 1, 2, 2),
-    (6, 0, 0, 3),
-    (7, 1, 1, 3),
-    (8, 0, 2, 3),
-    (9, 0, 2, 4),
-    (10, 0, 0, 4),
-    (11, 0, 1, 4),
-    (12, 1, 2, 5),
-    (13, 0, 0, 5),
-    (14, 0, 1, 5),
-    (15, 1, 2, 6),
-    (16, 0, 1, 6),
-    (17, 0, 0, 6),
-    (18, 1, 2, 7),
-    (19, 0, 1, 7),
-    (20, 1, 0, 7),
-    (21, 0, 0, 8),
-    (22, 1, 2, 8),
-    (23, 1, 1, 8),
-    (24, 0, 0, 9),
-    (25, 1, 2, 9),
-    (26, 0, 1, 9),
-    (27, 0, 0, 10),
-    (28, 0, 1, 10),
-    (29, 0, 2, 10),
-    (30, 0, 2, 11),
-    (31, 0, 1, 11),
-    (32, 0, 0, 11),
-    (33, 0, 0, 12),
-    (34, 0, 1, 12),
-    (35, 0, 2, 12),
+    Episode(0, 1, 2, 1),
+    Episode(1, 0, 0, 1),
+    Episode(2, 1, 1, 1),
+    Episode(3, 0, 0, 2),
+    Episode(4, 1, 1, 2),
+    Episode(5, 1, 2, 2),
+    Episode(6, 0, 0, 3),
+    Episode(7, 1, 1, 3),
+    Episode(8, 0, 2, 3),
+    Episode(9, 0, 2, 4),
+    Episode(10, 0, 0, 4),
+    Episode(11, 0, 1, 4),
+    Episode(12, 1, 2, 5),
+    Episode(13, 0, 0, 5),
+    Episode(14, 0, 1, 5),
+    Episode(15, 1, 2, 6),
+    Episode(16, 0, 1, 6),
+    Episode(17, 0, 0, 6),
+    Episode(18, 1, 2, 7),
+    Episode(19, 0, 1, 7),
+    Episode(20, 1, 0, 7),
+    Episode(21, 0, 0, 8),
+    Episode(22, 1, 2, 8),
+    Episode(23, 1, 1, 8),
+    Episode(24, 0, 0, 9),
+    Episode(25, 1, 2, 9),
+    Episode(26, 0, 1, 9),
+    Episode(27, 0, 0, 10),
+    Episode(28, 0, 1, 10),
+    Episode(29, 0, 2, 10),
+    Episode(30, 0, 2, 11),
+    Episode(31, 0, 1, 11),
+    Episode(32, 0, 0, 11),
+    Episode(33, 0, 0, 12),
+    Episode(34, 0, 1, 12),
+    Episode(35, 0, 2, 12),
     # Round 13 incomplete (only 2 of 3 policies), excluded
 ]
 
 
+@functools.lru_cache(maxsize=None)
 def fetch_num_frames(dataset_repo: str) -> dict[int, int]:
     """
     Fetch num_frames per episode_index from a HF LeRobot dataset.
-    Returns {episode_index: num_frames}.
+    Reads the per-episode `length` from the episodes metadata parquet, so
+    frame data is never downloaded.
+    Results are cached in-process and on disk (NUM_FRAMES_CACHE_DIR); the
+    disk copy is reused while the parquet's ETag is unchanged.
+    Returns {episode_index: num_frames}, or {} without downloading anything
+    if the dataset has no (or an empty) episodes parquet.
     """
-    ds = datasets.load_dataset(dataset_repo, split="train")
-    episode_frames: dict[int, int] = {}
-    for row in ds:
-        ep_idx = row["episode_index"]
-        frame_idx = row["frame_index"]
-        if ep_idx not in episode_frames or frame_idx + 1 > episode_frames[ep_idx]:
-            episode_frames[ep_idx] = frame_idx + 1
-    return episode_frames
+    parquet_url = f"https://huggingface.co/datasets/{dataset_repo}/resolve/main/meta/episodes/chunk-000/file-000.parquet"
+    head = http.head(parquet_url)
+    if head.status_code == 404:
+        return {}
+    head.raise_for_status()
+    # LFS files redirect to the CDN; the file's own ETag/size are X-Linked-*
+    size = head.headers.get("X-Linked-Size") or head.headers.get("Content-Length")
+    if size is not None and int(size) == 0:
+        return {}
+    etag = head.headers.get("X-Linked-Etag") or head.headers.get("ETag")
+
+    repo_hash = hashlib.sha256(dataset_repo.encode()).hexdigest()[:16]
+    cache_path = NUM_FRAMES_CACHE_DIR / f"{repo_hash}.json"
+    try:
+        cached = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        cached = None
+    if etag and cached and cached["etag"] == etag:
+        return {int(ep): n for ep, n in cached["num_frames"].items()}
+
+    resp = http.get(parquet_url)
+    resp.raise_for_status()
+    table = pq.read_table(io.BytesIO(resp.content), columns=["episode_index", "length"])
+    num_frames = dict(zip(table["episode_index"].to_pylist(), table["length"].to_pylist()))
+
+    if etag:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps({"etag": etag, "num_frames": num_frames}))
+    return num_frames
 
 
 def deduplicate_episodes(
-    episodes: list[tuple[int, int, int, int]],
-) -> dict[tuple[int, int], tuple[int, int, int, int]]:
+    episodes: list[Episode],
+) -> dict[tuple[int, int], Episode]:
     """
     For each (round_id, policy_id) pair, keep only the episode with the
     highest episode_index (last attempt). Returns a dict keyed by
-    (round_id, policy_id) -> episode tuple.
+    (round_id, policy_id) -> Episode.
     """
-    best: dict[tuple[int, int], tuple[int, int, int, int]] = {}
-    for ep in episodes:
-        episode_index, _success, policy_id, round_id = ep
-        key = (round_id, policy_id)
-        if key not in best or episode_index > best[key][0]:
-            best[key] = ep
+    # Visit episodes in episode_index order so the last write per key is
+    # the highest index; no per-row comparison against the current best.
+    best: dict[tuple[int, int], Episode] = {}
+    for ep in sorted(episodes, key=lambda ep: ep.episode_index):
+        best[(ep.round_id, ep.policy_id)] = ep
     return best
 
 
-def build_rounds(
-    episodes: list[tuple[int, int, int, int]],
+def build_session_payload(
+    episodes: list[Episode],
     policy_map: dict[int, tuple[str, str]],
     num_frames_map: dict[int, int],
     max_round: int | None = None,
-) -> list[RoundInput]:
+) -> tuple[list[PolicyInput], list[RoundInput]]:
+    """Build the policies and rounds to submit in one pass over policy_map."""
+    policies = []
+    model_id_by_pid = {}
+    for policy_id, (model_id, name) in policy_map.items():
+        policies.append(PolicyInput(name=name, model_id=model_id, environment=ENVIRONMENT))
+        model_id_by_pid[policy_id] = model_id
+    # best is keyed by (round_id, policy_id), so entries need no re-checking.
+    model_ids = [(pid, model_id_by_pid[pid]) for pid in sorted(model_id_by_pid)]
+
     best = deduplicate_episodes(episodes)
     round_ids = sorted({k[0] for k in best})
     if max_round is not None:
@@ -190,40 +242,26 @@ def build_rounds(
     rounds = []
     for round_id in round_ids:
         results = []
-        for policy_id in sorted(policy_map.keys()):
-            ep_index, success, pid, rid = best[(round_id, policy_id)]
-            assert pid == policy_id
-            assert rid == round_id
-            model_id = policy_map[policy_id][0]
+        for policy_id, model_id in model_ids:
+            ep = best[(round_id, policy_id)]
             results.append(
                 RoundResultInput(
                     model_id=model_id,
-                    success=bool(success),
-                    episode_index=ep_index,
-                    num_frames=num_frames_map.get(ep_index),
+                    success=bool(ep.success),
+                    episode_index=ep.episode_index,
+                    num_frames=num_frames_map.get(ep.episode_index),
                 )
             )
         rounds.append(RoundInput(round_index=round_id - 1, results=results))
 
-    return rounds
-
-
-def build_policies(policy_map: dict[int, tuple[str, str]]) -> list[PolicyInput]:
-    return [
-        PolicyInput(
-            name=name,
-            model_id=model_id,
-            environment=ENVIRONMENT,
-        )
-        for model_id, name in policy_map.values()
-    ]
+    return policies, rounds
 
 
 def submit_session(
     client: PolicyArenaClient,
     label: str,
     dataset_repo: str,
-    episodes: list[tuple[int, int, int, int]],
+    episodes: list[Episode],
     policy_map: dict[int, tuple[str, str]],
     notes: str,
     max_round: int | None = None,
@@ -231,10 +269,14 @@ def submit_session(
     print(f"=== {label}: {dataset_repo} ===")
     print("  Fetching num_frames from HF...")
     num_frames_map = fetch_num_frames(dataset_repo)
-    print(f"  Got frame counts for {len(num_frames_map)} episodes")
+    if num_frames_map:
+        print(f"  Got frame counts for {len(num_frames_map)} episodes")
+    else:
+        print("  Warning: no episode metadata on HF; submitting without num_frames")
 
-    policies = build_policies(policy_map)
-    rounds = build_rounds(episodes, policy_map, num_frames_map, max_round=max_round)
+    policies, rounds = build_session_payload(
+        episodes, policy_map, num_frames_map, max_round=max_round
+    )
     print(f"  Policies: {len(policies)}")
     print(f"  Rounds: {len(rounds)}")
     for r in rounds:
@@ -253,37 +295,36 @@ def submit_session(
 
 
 def main():
-    client = PolicyArenaClient(CONVEX_URL)
-
-    submit_session(
-        client,
-        label="Session 1",
-        dataset_repo="ankile/blind-eval-pick-cube-2026-02-14",
-        episodes=SESSION1_EPISODES,
-        policy_map=SESSION1_POLICY_MAP,
-        notes="Resubmitted from HF dataset. Rounds 1-2 deduplicated (warm-up retries removed).",
-    )
+    with PolicyArenaClient(CONVEX_URL) as client:
+        submit_session(
+            client,
+            label="Session 1",
+            dataset_repo="ankile/blind-eval-pick-cube-2026-02-14",
+            episodes=SESSION1_EPISODES,
+            policy_map=SESSION1_POLICY_MAP,
+            notes="Resubmitted from HF dataset. Rounds 1-2 deduplicated (warm-up retries removed).",
+        )
 
-    print()
-    submit_session(
-        client,
-        label="Session 2",
-        dataset_repo="ankile/blind-eval-pick-cube-2026-02-14-round2",
-        episodes=SESSION2_EPISODES,
-        policy_map=SESSION2_POLICY_MAP,
-        notes="Resubmitted from HF dataset.",
-    )
+        print()
+        submit_session(
+            client,
+            label="Session 2",
+            dataset_repo="ankile/blind-eval-pick-cube-2026-02-14-round2",
+            episodes=SESSION2_EPISODES,
+            policy_map=SESSION2_POLICY_MAP,
+            notes="Resubmitted from HF dataset.",
+        )
 
-    print()
-    submit_session(
-        client,
-        label="Session 3",
-        dataset_repo="ankile/blind-eval-dagger-progression-2026-02-14-r1",
-        episodes=SESSION3_EPISODES,
-        policy_map=SESSION3_POLICY_MAP,
-        notes="Resubmitted from HF dataset. Round 13 excluded (incomplete).",
-        max_round=12,
-    )
+        print()
+        submit_session(
+            client,
+            label="Session 3",
+            dataset_repo="ankile/blind-eval-dagger-progression-2026-02-14-r1",
+            episodes=SESSION3_EPISODES,
+            policy_map=SESSION3_POLICY_MAP,
+            notes="Resubmitted from HF dataset. Round 13 excluded (incomplete).",
+            max_round=12,
+        )
 
 
 if __name__ == "__main__":
@@ -7,61 +7,78 @@ from policy_arena import PolicyArenaClient, PolicyInput, RoundInput, RoundResult
 ARENA_URL = "https://grandiose-rook-292.convex.cloud"
 
 
-def main():
-    client = PolicyArenaClient(ARENA_URL)
+POLICIES = [
+    PolicyInput(
+        name="smoke-test-policy-A",
+        model_id="wandb://test/smoke/policy-a:v0",
+        environment="smoke_test",
+    ),
+    PolicyInput(
+        name="smoke-test-policy-B",
+        model_id="wandb://test/smoke/policy-b:v0",
+        environment="smoke_test",
+    ),
+]
 
-    # Build fake eval data with two policies and two rounds
-    policies = [
-        PolicyInput(
-            name="smoke-test-policy-A",
-            model_id="wandb://test/smoke/policy-a:v0",
-            environment="smoke_test",
-        ),
-        PolicyInput(
-            name="smoke-test-policy-B",
-            model_id="wandb://test/smoke/policy-b:v0",
-            environment="smoke_test",
-        ),
-    ]
+# Per round, the success of each policy in POLICIES order
+ROUND_SUCCESSES = [
+    (True, False),
+    (True, True),
+]
 
-    rounds = [
-        RoundInput(
-            round_index=0,
-            results=[
-                RoundResultInput(model_id="wandb://test/smoke/policy-a:v0", success=True, episode_index=0),
-                RoundResultInput(model_id="wandb://test/smoke/policy-b:v0", success=False, episode_index=1),
-            ],
-        ),
+
+def build_rounds(
+    policies: list[PolicyInput], round_successes: list[tuple[bool, ...]]
+) -> list[RoundInput]:
+    """One RoundInput per row of *round_successes*, numbering episodes in order."""
+    model_ids = [p.model_id for p in policies]
+    num_policies = len(model_ids)
+    return [
         RoundInput(
-            round_index=1,
+            round_index=round_index,
             results=[
-                RoundResultInput(model_id="wandb://test/smoke/policy-a:v0", success=True, episode_index=2),
-                RoundResultInput(model_id="wandb://test/smoke/policy-b:v0", success=True, episode_index=3),
+                RoundResultInput(
+                    model_id=model_id,
+                    success=success,
+                    episode_index=round_index * num_policies + i,
+                )
+                for i, (model_id, success) in enumerate(zip(model_ids, successes))
             ],
-        ),
+        )
+        for round_index, successes in enumerate(round_successes)
     ]
 
-    print("Submitting fake eval session...")
-    session_id = client.submit_eval_session(
-        dataset_repo="test/smoke-test-dataset",
-        policies=policies,
-        rounds=rounds,
-        notes="Smoke test submission",
-    )
-    print(f"Session submitted: {session_id}")
 
-    # Verify the policies appear on the leaderboard
-    leaderboard = client.get_leaderboard()
-    smoke_policies = [p for p in leaderboard if p.get("environment") == "smoke_test"]
-    print(f"\nLeaderboard entries for 'smoke_test' environment: {len(smoke_policies)}")
-    for p in smoke_policies:
-        print(f"  {p['name']}: elo={p['elo']}, W={p['wins']}/L={p['losses']}/D={p['draws']}")
+def main():
+    with PolicyArenaClient(ARENA_URL) as client:
+        # Build fake eval data with two policies and two rounds
+        policies = POLICIES
+        rounds = build_rounds(policies, ROUND_SUCCESSES)
+
+        print("Submitting fake eval session...")
+        session_id = client.submit_eval_session(
+            dataset_repo="test/smoke-test-dataset",
+            policies=policies,
+            rounds=rounds,
+            notes="Smoke test submission",
+        )
+        print(f"Session submitted: {session_id}")
+
+        # Verify the policies appear on the leaderboard
+        leaderboard = client.get_leaderboard()
+        smoke_policies = [p for p in leaderboard if p.get("environment") == "smoke_test"]
+        print(f"\nLeaderboard entries for 'smoke_test' environment: {len(smoke_policies)}")
+        if smoke_policies:
+            print("\n".join(
+                f"  {p['name']}: elo={p['elo']}, W={p['wins']}/L={p['losses']}/D={p['draws']}"
+                for p in smoke_policies
+            ))
 
-    if smoke_policies:
-        print("\nSmoke test PASSED")
-    else:
-        print("\nWARNING: No smoke_test entries found on leaderboard (may need time to propagate)")
-        sys.exit(1)
+        if smoke_policies:
+            print("\nSmoke test PASSED")
+        else:
+            print("\nWARNING: No smoke_test entries found on leaderboard (may need time to propagate)")
+            sys.exit(1)
 
 
 if __name__ == "__main__":
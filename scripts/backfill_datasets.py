@@ -188,11 +188,11 @@ DATASETS = [
 
 
 def main():
-    arena = PolicyArenaClient(ARENA_URL)
-    for ds in DATASETS:
-        arena.register_dataset(ds)
-        print(f"Registered: {ds.repo_id}")
-    print(f"\nDone. Registered {len(DATASETS)} datasets.")
+    with PolicyArenaClient(ARENA_URL) as arena:
+        arena.register_datasets_bulk(DATASETS)
+        for ds in DATASETS:
+            print(f"Registered: {ds.repo_id}")
+        print(f"\nDone. Registered {len(DATASETS)} datasets.")
 
 
 if __name__ == "__main__":
@@ -8,16 +8,21 @@ Usage:
     (run from the python/ directory)
 """
 
-import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
 
-import requests
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
+from huggingface_hub import HfFileSystem
 
 from policy_arena.client import PolicyArenaClient
 from policy_arena.types import PolicyInput
 
 ARENA_URL = "https://grandiose-rook-292.convex.cloud"
 
+# Shared across fetches (and threads) so connections to huggingface.co are reused
+hf_fs = HfFileSystem()
+
 # Pi0.5 rollout datasets and their corresponding model info
 # model_id uses @environment suffix to disambiguate same model across tasks
 PI05_DATASETS = [
@@ -52,62 +57,90 @@ PI05_DATASETS = [
 ]
 
 
-def fetch_episodes_from_parquet(repo_id: str) -> list[tuple[int, bool, int | None]]:
-    """Fetch per-episode success and frame counts from the parquet metadata.
+EPISODE_COLUMNS = ["episode_index", "length", "stats/success/max"]
+
+
+def open_episodes_parquet(repo_id: str) -> pq.ParquetFile:
+    """Open a dataset's episode metadata parquet for range reads.
+
+    Only the footer is read here; iter_episode_batches() then fetches just
+    the EPISODE_COLUMNS column chunks. The ParquetFile opens (and so owns)
+    the underlying HF file, which closing it releases.
+    """
+    return pq.ParquetFile(
+        f"datasets/{repo_id}/meta/episodes/chunk-000/file-000.parquet",
+        filesystem=hf_fs,
+    )
+
+
+def iter_episode_batches(
+    parquet: pq.ParquetFile, batch_size: int = 10_000
+) -> Iterator[list[tuple[int, bool, int | None]]]:
+    """Yield per-episode success and frame counts one record batch at a time.
 
     Uses stats/success/max as the success indicator (1.0 = success, 0.0 = failure).
-    Returns list of (episode_index, success, num_frames) sorted by episode_index.
+    Yields lists of (episode_index, success, num_frames) in file order, which
+    LeRobot writes by episode_index.
     """
-    parquet_url = f"https://huggingface.co/datasets/{repo_id}/resolve/main/meta/episodes/chunk-000/file-000.parquet"
-    resp = requests.get(parquet_url)
-    resp.raise_for_status()
-    table = pq.read_table(io.BytesIO(resp.content))
-    df = table.to_pandas()
-
-    result = []
-    for _, row in df.iterrows():
-        ep_idx = int(row["episode_index"])
-        num_frames = int(row["length"])
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=EPISODE_COLUMNS):
+        # Work on whole columns instead of boxing every row.
+        ep_idx = batch.column("episode_index").to_numpy()
+        num_frames = batch.column("length").to_numpy()
         # stats/success/max is a 1-element array; max >= 1 means success
-        success = int(row["stats/success/max"].max()) >= 1
-        result.append((ep_idx, success, num_frames))
-
-    return sorted(result, key=lambda x: x[0])
+        success = pc.list_element(batch.column("stats/success/max"), 0).to_numpy() >= 1
+        yield list(zip(ep_idx.tolist(), success.tolist(), num_frames.tolist()))
+
+
+def submit_dataset(arena: PolicyArenaClient, ds_info: dict, parquet: pq.ParquetFile):
+    repo_id = ds_info["repo_id"]
+    print(f"\nProcessing: {repo_id}")
+    print(f"  Model ID: {ds_info['model_id']}")
+    print(f"  Environment: {ds_info['environment']}")
+
+    policy = PolicyInput(
+        name=ds_info["policy_name"],
+        model_id=ds_info["model_id"],
+        model_url=ds_info["model_url"],
+        environment=ds_info["environment"],
+    )
+
+    num_episodes = num_success = 0
+
+    def counted(batches):
+        nonlocal num_episodes, num_success
+        for episodes in batches:
+            num_episodes += len(episodes)
+            num_success += sum(1 for _, s, _ in episodes if s)
+            yield episodes
+
+    # Each record batch is submitted as it is decoded.
+    session_id = arena.submit_rollout_session_streaming(
+        dataset_repo=repo_id,
+        policy=policy,
+        episode_batches=counted(iter_episode_batches(parquet)),
+        notes=f"Backfilled pi0.5 rollout from {repo_id}",
+    )
+    if session_id is None:
+        print("  Skipping (no episodes found)")
+        return
+
+    print(f"  Episodes: {num_episodes} ({num_success} success, {num_episodes - num_success} failure)")
+    print(f"  Created session: {session_id}")
 
 
 def main():
-    arena = PolicyArenaClient(ARENA_URL)
-
-    for ds_info in PI05_DATASETS:
-        repo_id = ds_info["repo_id"]
-        print(f"\nProcessing: {repo_id}")
-        print(f"  Model ID: {ds_info['model_id']}")
-        print(f"  Environment: {ds_info['environment']}")
-
-        episodes = fetch_episodes_from_parquet(repo_id)
-        if not episodes:
-            print("  Skipping (no episodes found)")
-            continue
-
-        num_success = sum(1 for _, s, _ in episodes if s)
-        print(f"  Episodes: {len(episodes)} ({num_success} success, {len(episodes) - num_success} failure)")
-
-        policy = PolicyInput(
-            name=ds_info["policy_name"],
-            model_id=ds_info["model_id"],
-            model_url=ds_info["model_url"],
-            environment=ds_info["environment"],
-        )
-
-        session_id = arena.submit_rollout_session(
-            dataset_repo=repo_id,
-            policy=policy,
-            episodes=episodes,
-            notes=f"Backfilled pi0.5 rollout from {repo_id}",
-        )
-        print(f"  Created session: {session_id}")
-
-    print("\nDone.")
+    with PolicyArenaClient(ARENA_URL) as arena:
+        # Open all parquets concurrently; submit each as soon as it is ready.
+        with ThreadPoolExecutor(max_workers=len(PI05_DATASETS)) as pool:
+            futures = {
+                pool.submit(open_episodes_parquet, ds_info["repo_id"]): ds_info
+                for ds_info in PI05_DATASETS
+            }
+            for future in as_completed(futures):
+                with future.result() as parquet:
+                    submit_dataset(arena, futures[future], parquet)
+
+        print("\nDone.")
 
 
 if __name__ == "__main__":
@@ -11,96 +11,150 @@ Usage:
     python -m scripts.backfill_rollout_sessions
 """
 
-import requests
+import asyncio
+import os
+from operator import itemgetter
 
-from policy_arena.client import PolicyArenaClient
+import pyarrow as pa
+import pyarrow.parquet as pq
+from huggingface_hub import HfFileSystem
+
+from policy_arena.async_client import AsyncPolicyArenaClient
+from policy_arena.cache import default_cache_dir
 from policy_arena.types import PolicyInput
+from scripts.hf_http import HFClient, filter_prefix, gather_bounded
 
 ARENA_URL = "https://grandiose-rook-292.convex.cloud"
-HF_DATASETS_SERVER = "https://datasets-server.huggingface.co"
+PARQUET_CACHE_DIR = default_cache_dir() / "parquet_meta"
+EPISODES_META_PATH = "meta/episodes/chunk-000/file-000.parquet"
 
+# Shared across datasets (and threads) so connections to huggingface.co are reused
+hf_fs = HfFileSystem()
 
-def fetch_episode_successes(repo_id: str) -> list[tuple[int, bool, int | None]]:
-    """Fetch per-episode success status from HuggingFace Datasets server.
 
-    Returns list of (episode_index, success, num_frames) sorted by episode_index.
+def read_episode_lengths(repo_id: str) -> pa.Table:
+    """Read just episode_index and length from the episodes metadata parquet.
+
+    The file is opened through HfFileSystem, so pyarrow fetches the footer
+    and those two column chunks with range requests instead of downloading
+    every per-feature stats column.
     """
-    episodes: dict[int, dict] = {}
-    offset = 0
-    page_size = 100
+    path = f"datasets/{repo_id}/{EPISODES_META_PATH}"
+    with hf_fs.open(path, "rb", block_size=1 << 20) as f:
+        return pq.read_table(f, columns=["episode_index", "length"])
 
-    while True:
-        url = (
-            f"{HF_DATASETS_SERVER}/filter?"
-            f"dataset={repo_id}&config=default&split=train"
-            f"&where=frame_index=0&offset={offset}&length={page_size}"
-        )
-        resp = requests.get(url)
+
+async def get_episode_lengths(hf: HFClient, repo_id: str) -> pa.Table:
+    """:func:`read_episode_lengths`, cached on disk by the file's ETag.
+
+    A HEAD request revalidates the cached table against its stored ETag, so
+    unchanged files are not read again on reruns.
+    """
+    url = f"https://huggingface.co/datasets/{repo_id}/resolve/main/{EPISODES_META_PATH}"
+    path = PARQUET_CACHE_DIR / f"{repo_id}.parquet"
+    etag_path = path.with_suffix(".etag")
+
+    # LFS files redirect to the CDN, so don't follow: the file's own ETag is
+    # X-Linked-Etag on the redirect, as in resubmit_sessions.fetch_num_frames.
+    resp = await hf.head(url, follow_redirects=False)
+    if not resp.is_redirect:
         resp.raise_for_status()
-        data = resp.json()
+    etag = resp.headers.get("X-Linked-Etag") or resp.headers.get("ETag")
+    if etag and path.exists() and etag_path.exists() and etag_path.read_text() == etag:
+        return pq.read_table(path)
+
+    table = await asyncio.to_thread(read_episode_lengths, repo_id)
+    if etag:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        etag_path.write_text(etag)
+    return table
+
+
+async def fetch_episode_successes(
+    hf: HFClient, repo_id: str, log: list[str]
+) -> list[tuple[int, bool, int | None]]:
+    """Fetch per-episode success status from HuggingFace Datasets server.
 
-        for item in data["rows"]:
-            row = item["row"]
-            ep_idx = row["episode_index"]
-            episodes[ep_idx] = {
-                "success": row.get("success", 0) == 1,
-            }
+    Returns list of (episode_index, success, num_frames) sorted by episode_index.
+    Warnings are appended to *log*, the caller's per-dataset output.
+    """
+    page_size = 100
 
-        # Check if we've fetched all rows
-        total = data.get("num_rows_total", 0)
-        offset += page_size
-        if offset >= total:
-            break
+    # Encoded once; each page only appends its offset
+    prefix = filter_prefix(repo_id, "frame_index=0")
+
+    def page_url(offset: int) -> str:
+        return f"{prefix}&offset={offset}&length={page_size}"
+
+    # Page 0 tells us num_rows_total; the remaining pages are independent,
+    # so fetch them concurrently.
+    first = await hf.get_json(page_url(0))
+    total = first.get("num_rows_total", 0)
+    pages = [first, *await asyncio.gather(*(
+        hf.get_json(page_url(offset)) for offset in range(page_size, total, page_size)
+    ))]
+
+    # Rows arrive in episode order page by page, so this list is normally
+    # already sorted and the sort below is a single linear pass.
+    successes = [
+        (item["row"]["episode_index"], item["row"].get("success", 0) == 1)
+        for data in pages
+        for item in data["rows"]
+    ]
+    successes.sort(key=itemgetter(0))
 
     # Now fetch num_frames from parquet metadata
-    parquet_url = f"https://huggingface.co/datasets/{repo_id}/resolve/main/meta/episodes/chunk-000/file-000.parquet"
+    lengths: dict[int, int] = {}
     try:
-        import pyarrow.parquet as pq
-        import io
-
-        parquet_resp = requests.get(parquet_url)
-        parquet_resp.raise_for_status()
-        table = pq.read_table(io.BytesIO(parquet_resp.content))
-        df = table.to_pandas()
-        for _, row in df.iterrows():
-            ep_idx = int(row["episode_index"])
-            if ep_idx in episodes:
-                episodes[ep_idx]["num_frames"] = int(row["length"])
+        table = await get_episode_lengths(hf, repo_id)
+        lengths = dict(zip(
+            table.column("episode_index").to_pylist(),
+            table.column("length").to_pylist(),
+        ))
     except Exception as e:
-        print(f"  Warning: could not fetch parquet metadata: {e}")
-
-    result = []
-    for ep_idx in sorted(episodes.keys()):
-        ep = episodes[ep_idx]
-        result.append((ep_idx, ep["success"], ep.get("num_frames")))
-    return result
+        log.append(f"  Warning: could not fetch parquet metadata: {e}")
 
+    return [
+        (ep_idx, success, lengths.get(ep_idx)) for ep_idx, success in successes
+    ]
 
-def main():
-    arena = PolicyArenaClient(ARENA_URL)
-
-    # Get rollout datasets that have a model_id (exclude dagger — human intervention skews success rates)
-    datasets = arena.list_datasets(source_types=["rollout"])
 
-    print(f"Found {len(datasets)} rollout datasets")
+async def backfill_dataset(
+    arena: AsyncPolicyArenaClient, hf: HFClient, ds: dict
+) -> str:
+    """Create the rollout session for one dataset.
 
-    for ds in datasets:
-        model_id = ds.get("model_id")
-        if not model_id:
-            print(f"  Skipping {ds['repo_id']} (no model_id)")
-            continue
-
-        print(f"\nProcessing: {ds['repo_id']}")
-        print(f"  Model ID: {model_id}")
-        print(f"  Task: {ds['task']}")
+    Returns ``"created"``, ``"skipped"`` or ``"failed"``; a failure is
+    logged and doesn't stop the other datasets. Its output is collected in
+    one buffer and printed as a single block.
+    """
+    model_id = ds.get("model_id")
+    if not model_id:
+        print(f"  Skipping {ds['repo_id']} (no model_id)")
+        return "skipped"
+
+    log = [
+        f"\nProcessing: {ds['repo_id']}",
+        f"  Model ID: {model_id}",
+        f"  Task: {ds['task']}",
+    ]
+    try:
+        # Sessions are created once per dataset, so reruns skip finished ones
+        # before fetching anything from HF.
+        if await arena.get_rollout_session(ds["repo_id"]) is not None:
+            log.append("  Skipping (rollout session exists)")
+            return "skipped"
 
-        episodes = fetch_episode_successes(ds["repo_id"])
+        episodes = await fetch_episode_successes(hf, ds["repo_id"], log)
         if not episodes:
-            print(f"  Skipping (no episodes found)")
-            continue
+            log.append("  Skipping (no episodes found)")
+            return "skipped"
 
         num_success = sum(1 for _, s, _ in episodes if s)
-        print(f"  Episodes: {len(episodes)} ({num_success} success, {len(episodes) - num_success} failure)")
+        log.append(f"  Episodes: {len(episodes)} ({num_success} success, {len(episodes) - num_success} failure)")
 
         # Extract policy name from model_id (last segment before :version)
         policy_name = model_id.split("/")[-1].split(":")[0]
@@ -111,15 +165,38 @@ def main():
             environment=ds["environment"],
         )
 
-        session_id = arena.submit_rollout_session(
+        session_id = await arena.submit_rollout_session(
             dataset_repo=ds["repo_id"],
             policy=policy,
             episodes=episodes,
             notes=f"Backfilled from {ds['source_type']} dataset",
         )
-        print(f"  Created session: {session_id}")
+        log.append(f"  Created session: {session_id}")
+        return "created"
+    except Exception as e:
+        log.append(f"  FAILED: {e}")
+        return "failed"
+    finally:
+        print("\n".join(log))
+
+
+async def main_async():
+    async with AsyncPolicyArenaClient(ARENA_URL) as arena, HFClient() as hf:
+        # Get rollout datasets that have a model_id (exclude dagger — human intervention skews success rates)
+        datasets = await arena.list_datasets(source_types=["rollout"])
+
+        print(f"Found {len(datasets)} rollout datasets")
+
+        statuses = await gather_bounded(backfill_dataset(arena, hf, ds) for ds in datasets)
+
+        print(
+            f"\nDone. Created {statuses.count('created')} sessions, "
+            f"{statuses.count('skipped')} skipped, {statuses.count('failed')} failed."
+        )
+
 
-    print("\nDone.")
+def main():
+    asyncio.run(main_async())
 
 
 if __name__ == "__main__":
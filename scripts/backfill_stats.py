@@ -3,75 +3,149 @@
 One-off script to backfill dataset stats (success/failure counts, frame sources,
 autonomous successes) for all registered datasets.
 
-Fetches episode metadata from HuggingFace Datasets server and updates Convex.
+Fetches episode metadata from HuggingFace Datasets server (and the data parquet
+for human-frame episodes) and updates Convex.
 
 Usage:
     python -m scripts.backfill_stats
 """
 
-import requests
-from convex import ConvexClient
+import asyncio
+import hashlib
+from typing import Awaitable
+
+import httpx
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from huggingface_hub import HfFileSystem
+
+from policy_arena.async_client import AsyncPolicyArenaClient
+from scripts.hf_http import (
+    INVALID_WHERE_STATUSES,
+    HFClient,
+    filter_prefix,
+    gather_bounded,
+    json_body,
+)
 
 ARENA_URL = "https://grandiose-rook-292.convex.cloud"
-DATASETS_SERVER = "https://datasets-server.huggingface.co"
 FPS = 15
+# Episodes (frame_index=0 rows) that succeeded
+SUCCESS_WHERE = "frame_index=0 AND success=1"
+# Stats updates written per datasets:updateStatsBulk mutation
+STATS_BATCH_SIZE = 50
 
+# Shared across datasets (and threads) so connections to huggingface.co are reused
+hf_fs = HfFileSystem()
 
-def fetch_episode_stats(repo_id: str) -> dict:
-    """Fetch success/failure counts from HF Datasets server."""
-    url = f"{DATASETS_SERVER}/filter?dataset={repo_id}&config=default&split=train&where=frame_index=0&length=100"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    data = resp.json()
 
-    successes = 0
-    failures = 0
-    for row_entry in data["rows"]:
-        row = row_entry["row"]
-        if row.get("success") == 1:
-            successes += 1
-        else:
-            failures += 1
+async def fetch_stats_key(hf: HFClient, repo_id: str) -> str | None:
+    """Key for the dataset's current HF revision, or None if it can't be read.
 
-    return {"num_success": successes, "num_failure": failures}
+    Stored alongside the stats, so a rerun can skip datasets whose files
+    haven't changed since they were last backfilled.
+    """
+    resp = await hf.get(f"https://huggingface.co/api/datasets/{repo_id}")
+    if resp.status_code != 200:
+        return None
+    sha = json_body(resp).get("sha")
+    if sha is None:
+        return None
+    return hashlib.sha1(f"{repo_id}@{sha}".encode()).hexdigest()
 
 
-def fetch_source_stats(repo_id: str) -> dict | None:
-    """Fetch human/policy frame counts and autonomous success info.
+async def count_rows(hf: HFClient, repo_id: str, where: str | None = None) -> int:
+    """Number of rows matching *where*, counted by HF Datasets server."""
+    data = await hf.get_json(f"{filter_prefix(repo_id, where)}&length=0")
+    return data["num_rows_total"]
 
-    Returns None if the dataset doesn't have a 'source' column.
-    """
-    base = f"{DATASETS_SERVER}/filter?dataset={repo_id}&config=default&split=train"
 
-    policy_resp = requests.get(f"{base}&where=source=0&length=1")
-    human_resp = requests.get(f"{base}&where=source=1&length=1")
+async def fetch_rows(hf: HFClient, repo_id: str, where: str) -> list[dict]:
+    """Fetch every row matching *where*. Pages past the first are concurrent."""
+    page_size = 100
+    # Encoded once; each page only appends its offset
+    prefix = filter_prefix(repo_id, where)
+
+    def page(offset: int) -> Awaitable[dict]:
+        return hf.get_json(f"{prefix}&offset={offset}&length={page_size}")
+
+    first = await page(0)
+    rest = await asyncio.gather(*(
+        page(offset) for offset in range(page_size, first["num_rows_total"], page_size)
+    ))
+    return [item["row"] for data in (first, *rest) for item in data["rows"]]
+
+
+def human_episode_indices(repo_id: str) -> set[int]:
+    """Episode indices with at least one source=1 (human) frame.
+
+    Reads only the episode_index and source columns of the dataset's data
+    parquet files, with the source filter pushed down into the reader.
+    """
+    paths = hf_fs.glob(f"datasets/{repo_id}/data/**/*.parquet")
+    if not paths:
+        return set()
+    table = pq.read_table(
+        paths,
+        columns=["episode_index"],
+        filters=[("source", "=", 1)],
+        filesystem=hf_fs,
+    )
+    return set(pc.unique(table.column("episode_index")).to_pylist())
+
+
+async def fetch_episode_stats(hf: HFClient, repo_id: str) -> dict:
+    """Fetch success/failure counts from HF Datasets server.
+
+    Both counts come from ``num_rows_total`` of ``length=0`` filters, so no
+    rows are transferred whatever the dataset size. Episodes without
+    ``success == 1`` count as failures.
+    """
+    num_episodes, success_resp = await asyncio.gather(
+        count_rows(hf, repo_id, "frame_index=0"),
+        hf.get(f"{filter_prefix(repo_id, SUCCESS_WHERE)}&length=0"),
+    )
+    # The server rejects the filter for datasets without a success column;
+    # like a missing source column, that means no successes. Any other error
+    # fails the dataset rather than recording its episodes as failures.
+    if success_resp.status_code in INVALID_WHERE_STATUSES:
+        successes = 0
+    else:
+        success_resp.raise_for_status()
+        successes = json_body(success_resp)["num_rows_total"]
+    return {"num_success": successes, "num_failure": num_episodes - successes}
+
+
+async def fetch_source_stats(hf: HFClient, repo_id: str) -> dict | None:
+    """Fetch human/policy frame counts and autonomous success info.
 
-    if policy_resp.status_code != 200 or human_resp.status_code != 200:
+    Returns None if the dataset doesn't have a 'source' column. Other
+    errors raise, so stats (and their stats_key) are never written from a
+    probe that failed for some other reason.
+    """
+    # Only num_rows_total is read, so length=0 and both probes in parallel
+    policy_resp, human_resp = await asyncio.gather(
+        hf.get(f"{filter_prefix(repo_id, 'source=0')}&length=0"),
+        hf.get(f"{filter_prefix(repo_id, 'source=1')}&length=0"),
+    )
+
+    statuses = {policy_resp.status_code, human_resp.status_code}
+    if statuses & INVALID_WHERE_STATUSES:
         return None
+    policy_resp.raise_for_status()
+    human_resp.raise_for_status()
 
-    policy_data = policy_resp.json()
-    human_data = human_resp.json()
+    policy_data = json_body(policy_resp)
+    human_data = json_body(human_resp)
 
     policy_frames = policy_data.get("num_rows_total")
     human_frames = human_data.get("num_rows_total")
     if policy_frames is None or human_frames is None:
         return None
 
-    # Paginate through human-source rows to collect unique episode indices
-    episodes_with_human = set()
-    if human_frames > 0:
-        offset = 0
-        page_size = 100
-        while offset < human_frames:
-            page_resp = requests.get(
-                f"{base}&where=source=1&offset={offset}&length={page_size}"
-            )
-            if page_resp.status_code != 200:
-                break
-            page_data = page_resp.json()
-            for row_entry in page_data["rows"]:
-                episodes_with_human.add(row_entry["row"]["episode_index"])
-            offset += page_size
+    # One columnar read of the data parquet replaces paging through every
+    # human-source frame just to collect its episode index.
+    episodes_with_human = await asyncio.to_thread(human_episode_indices, repo_id)
 
     return {
         "num_human_frames": human_frames,
@@ -80,89 +154,127 @@ def fetch_source_stats(repo_id: str) -> dict | None:
     }
 
 
-def fetch_episode_count_and_duration(repo_id: str) -> dict:
-    """Fetch total episode count and duration from frame_index=0 rows."""
-    url = f"{DATASETS_SERVER}/filter?dataset={repo_id}&config=default&split=train&where=frame_index=0&length=100"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    data = resp.json()
+async def fetch_episode_count_and_duration(hf: HFClient, repo_id: str) -> dict:
+    """Fetch total episode count and duration from HF Datasets server row counts."""
+    num_episodes, total_frames = await asyncio.gather(
+        count_rows(hf, repo_id, "frame_index=0"),
+        count_rows(hf, repo_id),
+    )
+    return {"num_episodes": num_episodes, "total_duration_seconds": total_frames / FPS}
 
-    num_episodes = len(data["rows"])
-    # Get total frame count from num_rows_total (all frames)
-    total_rows = data.get("num_rows_total", 0)
-    total_duration = total_rows / FPS
 
-    return {"num_episodes": num_episodes, "total_duration_seconds": total_duration}
+async def process_dataset(hf: HFClient, ds: dict) -> tuple[str, dict | None]:
+    """Compute one dataset's stats update.
+
+    Returns ``("ok", update)``, ``("skipped", None)`` when the dataset is
+    unchanged since its last backfill, or ``("failed", None)``. *update*
+    holds ``update_dataset_stats`` keyword arguments; they are written in
+    batches by :func:`main_async`.
+
+    Progress lines are printed together at the end so concurrent datasets
+    don't interleave their output.
+    """
+    repo_id = ds["repo_id"]
+    name = ds["name"]
+    log = [f"Processing: {name} ({repo_id})"]
+
+    try:
+        stats_key = await fetch_stats_key(hf, repo_id)
+        if stats_key is not None and ds.get("stats_key") == stats_key:
+            log.append("  Unchanged since last backfill, skipping\n")
+            return "skipped", None
+
+        # Fetch episode-level stats (success/failure)
+        ep_stats = await fetch_episode_stats(hf, repo_id)
+        log.append(f"  Episodes: {ep_stats['num_success']} success, {ep_stats['num_failure']} failed")
+
+        # Fetch source stats (human/policy frames) - may be None
+        source = await fetch_source_stats(hf, repo_id)
+
+        # Build update_dataset_stats args
+        num_episodes = ds["num_episodes"].value if ds.get("num_episodes") is not None else ep_stats["num_success"] + ep_stats["num_failure"]
+        total_duration = ds.get("total_duration_seconds") or 0.0
+
+        update_args: dict = {
+            "repo_id": repo_id,
+            "num_episodes": num_episodes,
+            "total_duration_seconds": total_duration,
+            "num_success": ep_stats["num_success"],
+            "num_failure": ep_stats["num_failure"],
+            # The probes above raise on anything but a real answer, so a
+            # stored key always stands for a complete backfill.
+            "stats_key": stats_key,
+        }
+
+        if source is not None:
+            update_args["num_human_frames"] = source["num_human_frames"]
+            update_args["num_policy_frames"] = source["num_policy_frames"]
+
+            success_eps = await get_successful_episode_indices(hf, repo_id)
+            autonomous = len(success_eps - source["episodes_with_human"])
+            update_args["num_autonomous_success"] = autonomous
+
+            log.append(f"  Frames: {source['num_human_frames']} human, {source['num_policy_frames']} policy")
+            log.append(f"  Autonomous successes: {autonomous}")
+        else:
+            log.append("  No source column (teleop/rollout/eval dataset)")
+
+        log.append("")
+        return "ok", update_args
+    except Exception as e:
+        log.append(f"  FAILED: {e}\n")
+        return "failed", None
+    finally:
+        print("\n".join(log))
+
+
+async def main_async():
+    async with AsyncPolicyArenaClient(ARENA_URL) as arena, HFClient() as hf:
+        datasets = await arena.list_datasets()
+
+        print(f"Found {len(datasets)} datasets to backfill.\n")
+
+        results = await gather_bounded(process_dataset(hf, ds) for ds in datasets)
+        updates = [update for status, update in results if status == "ok"]
+
+        # One mutation per batch instead of one round-trip per dataset. A
+        # rejected batch fails only its own datasets; later batches still run.
+        written = 0
+        for start in range(0, len(updates), STATS_BATCH_SIZE):
+            batch = updates[start:start + STATS_BATCH_SIZE]
+            try:
+                await arena.update_dataset_stats_bulk(batch)
+            except Exception as e:
+                repo_ids = ", ".join(u["repo_id"] for u in batch)
+                print(f"FAILED to write batch ({repo_ids}): {e}")
+                continue
+            written += len(batch)
+            print(f"Updated {written}/{len(updates)} datasets")
+
+        statuses = [status for status, _ in results]
+        fail_count = statuses.count("failed") + len(updates) - written
+        print(
+            f"Done. Backfilled {written} datasets, "
+            f"{statuses.count('skipped')} unchanged, {fail_count} failed."
+        )
 
 
 def main():
-    client = ConvexClient(ARENA_URL)
-    datasets = client.query("datasets:list", {})
-
-    print(f"Found {len(datasets)} datasets to backfill.\n")
-
-    success_count = 0
-    fail_count = 0
-    for ds in datasets:
-        repo_id = ds["repo_id"]
-        name = ds["name"]
-        print(f"Processing: {name} ({repo_id})")
-
-        try:
-            # Fetch episode-level stats (success/failure)
-            ep_stats = fetch_episode_stats(repo_id)
-            print(f"  Episodes: {ep_stats['num_success']} success, {ep_stats['num_failure']} failed")
-
-            # Fetch source stats (human/policy frames) - may be None
-            source = fetch_source_stats(repo_id)
-
-            # Build updateStats args
-            num_episodes = ds["num_episodes"].value if ds.get("num_episodes") is not None else ep_stats["num_success"] + ep_stats["num_failure"]
-            total_duration = ds.get("total_duration_seconds") or 0.0
-
-            update_args: dict = {
-                "repo_id": repo_id,
-                "num_episodes": num_episodes,
-                "total_duration_seconds": total_duration,
-                "num_success": ep_stats["num_success"],
-                "num_failure": ep_stats["num_failure"],
-            }
-
-            if source is not None:
-                update_args["num_human_frames"] = source["num_human_frames"]
-                update_args["num_policy_frames"] = source["num_policy_frames"]
-
-                success_eps = get_successful_episode_indices(repo_id)
-                autonomous = len(success_eps - source["episodes_with_human"])
-                update_args["num_autonomous_success"] = autonomous
-
-                print(f"  Frames: {source['num_human_frames']} human, {source['num_policy_frames']} policy")
-                print(f"  Autonomous successes: {autonomous}")
-            else:
-                print("  No source column (teleop/rollout/eval dataset)")
-
-            client.mutation("datasets:updateStats", update_args)
-            print(f"  Updated!\n")
-            success_count += 1
-        except Exception as e:
-            print(f"  FAILED: {e}\n")
-            fail_count += 1
-
-    print(f"Done. Backfilled {success_count} datasets, {fail_count} failed.")
-
-
-def get_successful_episode_indices(repo_id: str) -> set[int]:
-    """Get set of episode indices where success=1."""
-    url = f"{DATASETS_SERVER}/filter?dataset={repo_id}&config=default&split=train&where=frame_index=0&length=100"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    data = resp.json()
+    asyncio.run(main_async())
 
-    return {
-        row_entry["row"]["episode_index"]
-        for row_entry in data["rows"]
-        if row_entry["row"].get("success") == 1
-    }
+
+async def get_successful_episode_indices(hf: HFClient, repo_id: str) -> set[int]:
+    """Get set of episode indices where success=1.
+
+    Empty for datasets without a success column, as in :func:`fetch_episode_stats`.
+    """
+    try:
+        rows = await fetch_rows(hf, repo_id, SUCCESS_WHERE)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code not in INVALID_WHERE_STATUSES:
+            raise
+        return set()
+    return {row["episode_index"] for row in rows}
 
 
 if __name__ == "__main__":
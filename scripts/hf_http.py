@@ -0,0 +1,128 @@
+"""Async HTTP helpers shared by the HuggingFace backfill scripts."""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Iterable, TypeVar
+from urllib.parse import urlencode
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # optional: pip install policy-arena[fast]
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+T = TypeVar("T")
+
+DATASETS_SERVER = "https://datasets-server.huggingface.co"
+# Statuses /filter answers a where clause it can't apply with, e.g. one
+# naming a column the dataset doesn't have
+INVALID_WHERE_STATUSES = {400, 422}
+HTTP_TIMEOUT = 30
+# Requests in flight at once across all fetches sharing one HFClient
+MAX_CONCURRENCY = 32
+# Rate limits and transient server errors are retried with exponential backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+# Datasets a backfill script works on at once
+DATASET_CONCURRENCY = 8
+
+
+class HFClient:
+    """One keep-alive ``httpx.AsyncClient`` for every HF request in a run.
+
+    Concurrent callers share the connection pool; a semaphore keeps at most
+    *max_concurrency* requests in flight so large fan-outs queue here
+    instead of timing out waiting for a pooled connection.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY):
+        self._session = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+                keepalive_expiry=60.0,
+            ),
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "HFClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._session.aclose()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying RETRY_STATUSES and connection errors.
+
+        Once retries run out the last response is returned as-is, so callers
+        keep their own status checks.
+        """
+        for attempt in range(MAX_RETRIES):
+            delay = BACKOFF_FACTOR * 2**attempt
+            try:
+                resp = await self._send(method, url, **kwargs)
+            except httpx.TransportError:
+                pass
+            else:
+                if resp.status_code not in RETRY_STATUSES:
+                    return resp
+                retry_after = resp.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = int(retry_after)
+            await asyncio.sleep(delay)
+        return await self._send(method, url, **kwargs)
+
+    async def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self._semaphore:
+            return await self._session.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET *url* with retries; see :meth:`request`."""
+        return await self.request("GET", url, **kwargs)
+
+    async def head(self, url: str, **kwargs) -> httpx.Response:
+        """HEAD *url* with retries; see :meth:`request`."""
+        return await self.request("HEAD", url, **kwargs)
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        """GET *url* and decode its JSON body, raising on an error status."""
+        resp = await self.get(url, **kwargs)
+        resp.raise_for_status()
+        return json_body(resp)
+
+
+def filter_prefix(repo_id: str, where: str | None = None) -> str:
+    """``/filter`` URL for *repo_id* and *where*, ready for ``&offset=``/``&length=``."""
+    params = {"dataset": repo_id, "config": "default", "split": "train"}
+    if where is not None:
+        params["where"] = where
+    return f"{DATASETS_SERVER}/filter?{urlencode(params)}"
+
+
+def json_body(resp: httpx.Response) -> Any:
+    """Decode a response's JSON body, with orjson when it is installed."""
+    return _loads(resp.content)
+
+
+async def gather_bounded(
+    coros: Iterable[Awaitable[T]], limit: int = DATASET_CONCURRENCY
+) -> list[T]:
+    """``asyncio.gather`` with at most *limit* of *coros* running at once.
+
+    The backfill scripts run one coroutine per dataset through this; the
+    HFClient semaphore separately caps the HF requests they share.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coro: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(bounded(coro) for coro in coros))